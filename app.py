@@ -1,77 +1,298 @@
+import time
+_import_started = time.perf_counter()
 import os
-import requests
-from dotenv import load_dotenv
-from docx import Document
-import re
-import json
+import sys
 import streamlit as st
-from io import BytesIO
-from zipfile import ZipFile
-
-class ReviewSnippets:
-    def __init__(self):
-        load_dotenv()
-        self.api_url = os.getenv("Llama_API_URL")
-        self.api_key = os.getenv("Llama_API_KEY")
-
-    def get_blog(self, topic, structure):
-        messages = [
-            {
-                "role": "system",
-                "content": f'''Act as an expert content writer and generate a blog for my e-commerce site BestViewsReviews for Amazon Products. It is a GenAI platform that analyzes unstructured e-commerce product information like customer reviews, blogs, manufacturer-written product descriptions, etc., and generates insights and product recommendations. 
-                Following is the structure of the blog:
-                {structure}
-                Topic: {topic}'''
-            },
-            {
-                "role": "user",
-                "content": f'Topic: {topic}'
-            }
-        ]
-
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_key}'
-        }
-        payload = {
-            "model": "meta-llama/Meta-Llama-3-8B-Instruct",
-            "temperature": 0.7,
-            "top_p": 0.95,
-            "messages": messages,
-            "max_tokens": 2048
-        }
-
+from batch import DEFAULT_MAX_IN_FLIGHT, iter_batch
+from scheduler import GenerationError
+from export import FORMATS, content_digest, export_zip, pool_size
+from sections import generate_sectioned, regenerate_section
+from prompts import DEFAULT_CONTEXT_TOKENS, DEFAULT_TOP_K, Completion
+from generator import ReviewSnippets, generate_blog
+from metrics import batch_context, get_metrics, serve_metrics, summarize
+from dedupe import cluster_aliases, cluster_topics, expand_results, parse_topics
+from quality import DEFAULT_RETRY_BUDGET, repair_blog
+# python-docx, numpy, dotenv and the job queue are imported where they are first
+# used, so a cold start and every rerun only pay for what the page touches.
+IMPORT_SECONDS = time.perf_counter() - _import_started
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# jobs are (topic, structure) or (topic, structure, description) tuples. With a
+# retry budget each blog goes through the quality gate; issues left after the
+# retries are kept per topic in st.session_state.quality.
+def generate_blogs(extractor, jobs, max_in_flight, refresh=False, sectioned=False, retry_budget=0):
+    quality = {}
+
+    def generate(topic, structure, description=None):
         try:
-            response = requests.post(self.api_url, headers=headers, data=json.dumps(payload))
-            response.raise_for_status()
-            response_json = response.json()
-            generated_text = response_json['choices'][0]['message']['content']
-            return generated_text
-
-        except requests.exceptions.RequestException as e:
-            return f"Request failed: {e}"
-
-    def save_to_doc(self, content, topic):
-        doc = Document()
-        paragraph = doc.add_paragraph()
-
-        parts = re.split(r'(\*\*.*?\*\*)', content)
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                run = paragraph.add_run(part[2:-2])
-                run.bold = True
-            else:
-                paragraph.add_run(part)
-
-        doc_io = BytesIO()
-        doc.save(doc_io)
-        doc_io.seek(0)
-        return doc_io
+            completion = generate_blog(extractor, topic, structure, refresh, sectioned, description)
+            if not retry_budget:
+                return completion.text
+            report = repair_blog(extractor, topic, structure, completion, description, retry_budget)
+            quality[topic] = {"issues": [issue._asdict() for issue in report.issues], "repairs": report.repairs}
+            return report.content
+        except GenerationError as e:
+            return e
+
+    progress = st.progress(0.0)
+    blogs = []
+    failed = []
+    with batch_context("multi") as events, extractor.usage.batch() as usage:
+        with extractor.metrics.timer("batch_total"):
+            for done, (job, result) in enumerate(zip(jobs, iter_batch(generate, jobs, max_in_flight)), 1):
+                topic = job[0]
+                if isinstance(result, GenerationError):
+                    failed.append((topic, result))
+                else:
+                    blogs.append((topic, result))
+                progress.progress(done / len(jobs))
+    progress.empty()
+    st.session_state.timing = summarize(events)
+    st.session_state.quality = quality
+    return blogs, failed, usage
+
+def show_usage(records):
+    if not records:
+        return
+    prompt_tokens = sum(record['prompt_tokens'] or 0 for record in records if not record['cached'])
+    completion_tokens = sum(record['completion_tokens'] or 0 for record in records if not record['cached'])
+    cached = sum(1 for record in records if record['cached'])
+    with st.expander(f"Token usage: {prompt_tokens} prompt + {completion_tokens} completion ({cached} of {len(records)} calls cached)"):
+        st.dataframe(records, use_container_width=True)
+
+def show_timing(rows):
+    if rows:
+        with st.expander("Timing by stage (seconds)"):
+            st.dataframe(rows, use_container_width=True)
+
+def show_quality(topic, quality):
+    if not quality:
+        return
+    repaired = f" after repairing {quality['repairs']} part(s)" if quality['repairs'] else ""
+    if not quality['issues']:
+        if repaired:
+            st.caption(f"Quality checks passed{repaired}.")
+        return
+    with st.expander(f"{len(quality['issues'])} quality issue(s) left in {topic}{repaired}"):
+        for issue in quality['issues']:
+            st.write(f"**{issue['section'] or 'Whole blog'}** ({issue['kind']}): {issue['message']}")
+
+def show_failures(failed):
+    for topic, error in failed:
+        status = f" (HTTP {error.status})" if error.status else ""
+        st.error(f"Generation failed for {topic}{status} after {error.attempts} attempt(s): {error.message}")
+
+# Cached across reruns and sessions so config loading and the HTTP pool are set up once
+@st.cache_resource
+def get_extractor():
+    return ReviewSnippets()
+
+# Keyed on (topic, content hash); the content itself is excluded from hashing
+@st.cache_data(max_entries=1024, show_spinner=False)
+def docx_bytes(topic, digest, _content):
+    return get_extractor().save_to_doc(_content, topic).getvalue()
+
+def blog_docx(topic, content):
+    return docx_bytes(topic, content_digest(content), content)
+
+def show_blog_results(blogs, failed, usage=None, quality=None):
+    show_failures(failed)
+    show_usage(usage)
+    show_timing(st.session_state.get('timing'))
+    for topic, blog_content in blogs:
+        st.text_area(f"Blog for {topic}", blog_content, height=200)
+        show_quality(topic, (quality or {}).get(topic))
+        st.download_button(
+            label=f"Download {topic}.docx",
+            data=blog_docx(topic, blog_content),
+            file_name=f"{topic}.docx",
+            mime=DOCX_MIME
+        )
+
+    # The archive is only assembled when asked for, then kept until the blogs or formats change
+    formats = st.multiselect("Formats in the ZIP", FORMATS, default=["docx"],
+                             help="Each format goes in its own folder, with a manifest.json listing every blog")
+    signature = content_digest(",".join(formats) + "\n" + "\n".join(f"{topic}\0{content_digest(content)}" for topic, content in blogs))
+    archive = st.session_state.get('zip_archive')
+    if archive is not None and archive[0] != signature:
+        archive = st.session_state.zip_archive = None
+    if archive is None and formats and st.button("Prepare ZIP of all blogs"):
+        # DOCX bytes come from the same cache as the per-blog download buttons,
+        # so only the cheap formats are rendered and no process pool is needed
+        rendered = [fmt for fmt in formats if fmt != "docx"]
+        with get_extractor().metrics.timer("zip_build"), st.spinner("Rendering..."):
+            zip_file = export_zip(blogs, formats, pool_size(len(blogs), rendered), prerendered={"docx": blog_docx})
+            # The download button needs the bytes anyway; keep that one copy
+            # instead of re-reading the spooled file on every rerun
+            with zip_file:
+                archive = st.session_state.zip_archive = (signature, zip_file.read())
+    if archive is not None:
+        st.download_button(
+            label="Download All Blogs as ZIP",
+            data=archive[1],
+            file_name="all_blogs.zip",
+            mime="application/zip"
+        )
+
+# Built once per generated blog and then patched section by section
+def single_blog_document(extractor):
+    if st.session_state.get('single_blog_doc') is None:
+        from markdown_render import BlogDocument
+        with extractor.metrics.timer("docx_render"):
+            st.session_state.single_blog_doc = BlogDocument(st.session_state.single_blog_content)
+    return st.session_state.single_blog_doc
+
+def show_section_editor(extractor, topic, structure):
+    document = single_blog_document(extractor)
+    sections = document.tree.sections
+    if not sections:
+        return
+    with st.expander("Regenerate a section"):
+        index = st.selectbox("Section", range(len(sections)),
+                             format_func=lambda i: f"{'› ' * sections[i].depth}{sections[i].id}  {sections[i].title}")
+        instructions = st.text_input("Instructions for the new version (optional)")
+        if st.button("Regenerate section"):
+            with batch_context("section") as events, extractor.usage.batch() as usage:
+                try:
+                    with st.spinner(f"Regenerating {sections[index].title}..."):
+                        _, completion = regenerate_section(extractor, topic, structure, document.tree, sections[index].id,
+                                                           st.session_state.get('single_blog_description'), instructions or None)
+                    with extractor.metrics.timer("docx_patch"):
+                        tree = document.replace_section(sections[index].id, completion.text)
+                    st.session_state.single_blog_content = tree.text()
+                except GenerationError as e:
+                    show_failures([(f"{topic} / {sections[index].title}", e)])
+                    return
+            st.session_state.timing = summarize(events)
+            st.session_state.usage = usage
+            st.rerun()
+
+@st.cache_resource
+def get_job_queue():
+    from jobqueue import JobQueue
+    return JobQueue()
+
+# The batch id also goes into the URL so a browser refresh, or another editor
+# given the link, picks the batch back up.
+def submit_batch(jobs, refresh=False, sectioned=False, retry_budget=0):
+    batch_id = get_job_queue().enqueue([dict(zip(("topic", "structure", "description"), job)) for job in jobs],
+                                       {"refresh": refresh, "sectioned": sectioned, "retry_budget": retry_budget})
+    st.session_state.batch_id = batch_id
+    st.query_params["batch"] = batch_id
+    return batch_id
+
+# aliases maps a generated topic to near-duplicate topics that reuse its blog
+def dispatch_blogs(extractor, jobs, max_in_flight, refresh=False, sectioned=False, background=False, aliases=None, retry_budget=0):
+    st.session_state.topic_aliases = aliases or {}
+    if background:
+        submit_batch(jobs, refresh, sectioned, retry_budget)
+        return
+    st.session_state.pop('batch_id', None)
+    st.query_params.pop("batch", None)
+    st.session_state.blogs, st.session_state.failed, st.session_state.usage = generate_blogs(extractor, jobs, max_in_flight, refresh, sectioned, retry_budget)
+
+# Returns True while the batch still has queued or running jobs, so the caller can poll.
+def show_queued_batch(batch_id):
+    from jobqueue import error_from_dict
+    queue = get_job_queue()
+    status = queue.batch_status(batch_id)
+    if not status['total']:
+        st.warning(f"Batch {batch_id} was not found in the job queue.")
+        return False
+    finished = status['done'] + status['failed']
+    st.progress(finished / status['total'], text=f"Batch {batch_id[:8]}: {status['done']} done, {status['failed']} failed, "
+                                                 f"{status['running']} running, {status['queued']} queued")
+    if finished < status['total']:
+        if not queue.live_workers():
+            st.warning("No queue workers are running. Start them with `python jobqueue.py worker`.")
+        return True
+
+    blogs = []
+    failed = []
+    usage = []
+    quality = {}
+    for topic, result, error in queue.batch_results(batch_id):
+        if error is not None:
+            failed.append((topic, error_from_dict(error)))
+            continue
+        blogs.append((topic, result['content']))
+        if 'quality' in result:
+            quality[topic] = result['quality']
+        usage.append({"job": topic, "prompt_tokens": result['usage'].get('prompt_tokens'),
+                      "completion_tokens": result['usage'].get('completion_tokens'),
+                      "finish_reason": result['finish_reason'], "cached": result['cached']})
+    st.session_state.timing = None
+    aliases = st.session_state.get('topic_aliases')
+    show_blog_results(expand_results(blogs, aliases), expand_results(failed, aliases), usage, quality)
+    return False
+
+def show_multi_results():
+    batch_id = st.session_state.get('batch_id') or st.query_params.get("batch")
+    if batch_id:
+        return show_queued_batch(batch_id)
+    if 'blogs' in st.session_state:
+        aliases = st.session_state.get('topic_aliases')
+        show_blog_results(expand_results(st.session_state.blogs, aliases),
+                          expand_results(st.session_state.get('failed', []), aliases), st.session_state.get('usage'),
+                          st.session_state.get('quality'))
+    return False
+
+# The entry count is a SQLite query, so it is refreshed every few seconds rather than on every rerun
+@st.cache_data(ttl=5, show_spinner=False)
+def cache_stats(_cache):
+    return _cache.stats()
+
+# Memory-mapped, so one copy is shared by every session
+@st.cache_resource
+def get_product_index(index_dir):
+    from retrieval import ProductIndex
+    return ProductIndex(index_dir)
+
+def ground_jobs(jobs, retriever, top_k, context_tokens):
+    if retriever is None:
+        return jobs
+    return [(topic, structure, retriever.context(topic, top_k, context_tokens)[0] or None) for topic, structure in jobs]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def topic_clusters(topics_text):
+    topics_list = parse_topics(topics_text)
+    return topics_list, cluster_topics(topics_list)
 
 # Streamlit UI
 def main():
     st.title("AI Blog Generator for BVR")
 
+    extractor = get_extractor()
+    serve_metrics()
+    refresh = st.sidebar.checkbox("Bypass cache (regenerate)", value=False)
+    sectioned = st.sidebar.checkbox("Generate sections in parallel", value=False,
+                                    help="Split the structure into sections and generate them concurrently, so long blogs are not cut off at max_tokens")
+    background = st.sidebar.checkbox("Run in background queue", value=False,
+                                     help="Hand multi-blog batches to `python jobqueue.py worker` processes; results survive page refreshes")
+    check_quality = st.sidebar.checkbox("Check quality and repair failing sections", value=False,
+                                        help="Check headings, length and FAQ answers locally and regenerate only what fails, "
+                                             f"with up to {DEFAULT_RETRY_BUDGET} extra requests per blog")
+    retry_budget = DEFAULT_RETRY_BUDGET if check_quality else 0
+    polling = False
+    with st.sidebar.expander("Product grounding"):
+        index_dir = st.text_input("Product index directory", os.getenv("BVR_PRODUCT_INDEX", ""),
+                                  help="Built with `python retrieval.py build corpus.jsonl --out <dir>`")
+        top_k = st.number_input("Products per blog", min_value=1, max_value=50, value=DEFAULT_TOP_K, step=1)
+        context_tokens = st.number_input("Product context tokens", min_value=100, max_value=6000, value=DEFAULT_CONTEXT_TOKENS, step=100)
+    retriever = None
+    if index_dir:
+        try:
+            retriever = get_product_index(index_dir)
+            st.sidebar.caption(f"Grounding on {retriever.n_docs} indexed products")
+        except (OSError, ValueError) as e:
+            st.sidebar.error(f"Could not load product index: {e}")
+    if extractor.cache is not None:
+        stats = cache_stats(extractor.cache)
+        st.sidebar.caption(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    with st.sidebar.expander("LLM backends"):
+        st.dataframe(extractor.router.snapshot(), use_container_width=True)
+
     mode = st.radio("Select Mode", ["Single Blog", "Multiple Blogs with single blog structure", "Multiple Blogs with separate structure"])
 
     if mode == "Single Blog":
@@ -94,56 +315,77 @@ def main():
         What size of food processor do I need?
         ''')
 
+        stream = st.checkbox("Stream output", value=True, disabled=sectioned)
+
         if st.button("Generate Blog"):
-            extractor = ReviewSnippets()
-            blog_content = extractor.get_blog(topic, structure)
-            st.session_state.single_blog_content = blog_content
+            with batch_context("single") as events, extractor.usage.batch() as usage:
+                description = None
+                if retriever is not None:
+                    description = retriever.context(topic, top_k, context_tokens)[0] or None
+                try:
+                    if sectioned:
+                        with st.spinner("Generating sections..."):
+                            completion = generate_sectioned(extractor, topic, structure, refresh=refresh, description=description)
+                    elif stream:
+                        blog_content = st.write_stream(extractor.stream_blog(topic, structure, refresh=refresh, description=description))
+                        # Only this session's calls are in usage, so the last record is this stream's
+                        completion = Completion(blog_content, usage[-1]['finish_reason'] if usage else None, {}, False)
+                    else:
+                        completion = extractor.complete(topic, structure, refresh=refresh, description=description)
+                    st.session_state.quality = {}
+                    if retry_budget:
+                        with st.spinner("Checking quality..."):
+                            report = repair_blog(extractor, topic, structure, completion, description, retry_budget)
+                        st.session_state.quality = {topic: {"issues": [issue._asdict() for issue in report.issues], "repairs": report.repairs}}
+                        completion = completion._replace(text=report.content)
+                    st.session_state.single_blog_content = completion.text
+                    st.session_state.single_blog_description = description
+                    st.session_state.single_blog_doc = None
+                except GenerationError as e:
+                    show_failures([(topic, e)])
+            st.session_state.timing = summarize(events)
+            st.session_state.usage = usage
 
         if 'single_blog_content' in st.session_state:
+            show_usage(st.session_state.get('usage'))
+            show_timing(st.session_state.get('timing'))
             st.text_area("Generated Blog Content", st.session_state.single_blog_content, height=400)
-            doc_io = ReviewSnippets().save_to_doc(st.session_state.single_blog_content, topic)
+            show_quality(topic, st.session_state.get('quality', {}).get(topic))
+            show_section_editor(extractor, topic, structure)
             st.download_button(
                 label="Download Blog as DOCX",
-                data=doc_io,
+                data=single_blog_document(extractor).to_bytes(),
                 file_name=f"{topic}.docx",
-                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                mime=DOCX_MIME
             )
 
     elif mode == "Multiple Blogs with single blog structure":
         topics = st.text_area("Enter the blog topics (one per line)", "Topic 1\nTopic 2\nTopic 3")
         structure = st.text_area("Enter the blog structure", '''Blog Structure...''')
 
+        topics_list, clusters = topic_clusters(topics)
+        duplicates = [cluster for cluster in clusters if len(cluster.members) > 1]
+        duplicate_mode = "Generate every topic"
+        if duplicates:
+            with st.expander(f"{len(topics_list)} topics, {len(clusters)} distinct after merging near-duplicates"):
+                for cluster in duplicates:
+                    st.write(f"**{cluster.representative}**: " + ", ".join(cluster.members[1:]))
+            duplicate_mode = st.radio("Near-duplicate topics", ["Reuse one blog per cluster", "Generate one blog per cluster", "Generate every topic"],
+                                      index=2, help="Reuse gives every topic in a cluster the blog generated for its first topic; check the clusters above first")
+
+        max_in_flight = st.number_input("Max concurrent requests", min_value=1, max_value=64, value=DEFAULT_MAX_IN_FLIGHT, step=1)
+
         if st.button("Generate Blogs"):
-            extractor = ReviewSnippets()
-            topics_list = topics.split("\n")
-            st.session_state.blogs = []
-
-            for topic in topics_list:
-                blog_content = extractor.get_blog(topic, structure)
-                st.session_state.blogs.append((topic, blog_content))
-
-        if 'blogs' in st.session_state:
-            zip_buffer = BytesIO()
-            with ZipFile(zip_buffer, "w") as zip_file:
-                for topic, blog_content in st.session_state.blogs:
-                    st.text_area(f"Blog for {topic}", blog_content, height=200)
-                    doc_io = ReviewSnippets().save_to_doc(blog_content, topic)
-                    zip_file.writestr(f"{topic}.docx", doc_io.read())
-
-                    st.download_button(
-                        label=f"Download {topic}.docx",
-                        data=doc_io,
-                        file_name=f"{topic}.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-
-            zip_buffer.seek(0)
-            st.download_button(
-                label="Download All Blogs as ZIP",
-                data=zip_buffer,
-                file_name="all_blogs.zip",
-                mime="application/zip"
-            )
+            aliases = None
+            if duplicate_mode == "Generate every topic":
+                jobs = [(topic, structure) for topic in dict.fromkeys(topics_list)]
+            else:
+                jobs = [(cluster.representative, structure) for cluster in clusters]
+                if duplicate_mode == "Reuse one blog per cluster":
+                    aliases = cluster_aliases(clusters)
+            dispatch_blogs(extractor, ground_jobs(jobs, retriever, top_k, context_tokens), max_in_flight, refresh, sectioned, background, aliases, retry_budget)
+
+        polling = show_multi_results()
 
     elif mode == "Multiple Blogs with separate structure":
         num_blogs = st.number_input("Enter number of blogs", min_value=1, step=1)
@@ -157,39 +399,55 @@ def main():
             topics.append(topic)
             structures.append(structure)
 
+        max_in_flight = st.number_input("Max concurrent requests", min_value=1, max_value=64, value=DEFAULT_MAX_IN_FLIGHT, step=1)
+
         if st.button("Generate Blogs"):
-            extractor = ReviewSnippets()
-            st.session_state.blogs = []
-
-            for topic, structure in zip(topics, structures):
-                blog_content = extractor.get_blog(topic, structure)
-                st.session_state.blogs.append((topic, blog_content))
-
-        if 'blogs' in st.session_state:
-            zip_buffer = BytesIO()
-            with ZipFile(zip_buffer, "w") as zip_file:
-                for topic, blog_content in st.session_state.blogs:
-                    st.text_area(f"Blog for {topic}", blog_content, height=200)
-                    doc_io = ReviewSnippets().save_to_doc(blog_content, topic)
-                    zip_file.writestr(f"{topic}.docx", doc_io.read())
-
-                    st.download_button(
-                        label=f"Download {topic}.docx",
-                        data=doc_io,
-                        file_name=f"{topic}.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-
-            zip_buffer.seek(0)
-            st.download_button(
-                label="Download All Blogs as ZIP",
-                data=zip_buffer,
-                file_name="all_blogs.zip",
-                mime="application/zip"
-            )
+            jobs = list(zip(topics, structures))
+            dispatch_blogs(extractor, ground_jobs(jobs, retriever, top_k, context_tokens), max_in_flight, refresh, sectioned, background, retry_budget=retry_budget)
+
+        polling = show_multi_results()
 
     st.markdown("---")
     st.markdown("### Created by AkshayTriapthiShorthillsAI")
 
+    return polling
+
+def profiling_enabled():
+    return os.getenv("BVR_PROFILE") == "1" or st.query_params.get("profile") == "1"
+
+# Times the script's own imports and the whole rerun, feeds both to the stage
+# histograms and shows them with the hottest functions of this rerun.
+def run_profiled():
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        polling = main()
+    finally:
+        profiler.disable()
+        rerun_seconds = time.perf_counter() - started
+        metrics = get_metrics()
+        metrics.observe("app_imports", IMPORT_SECONDS)
+        metrics.observe("app_rerun", rerun_seconds)
+        history = st.session_state.setdefault('profile_history', [])
+        history.append({"imports_ms": round(IMPORT_SECONDS * 1000, 1), "rerun_ms": round(rerun_seconds * 1000, 1)})
+        del history[:-50]
+
+    with st.sidebar.expander("Profile", expanded=True):
+        st.caption(f"Imports {IMPORT_SECONDS * 1000:.1f} ms, rerun {rerun_seconds * 1000:.1f} ms "
+                   f"(heavy modules loaded: {', '.join(name for name in ('docx', 'numpy', 'jobqueue') if name in sys.modules) or 'none'})")
+        st.line_chart(history)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        st.code(out.getvalue())
+    return polling
+
 if __name__ == "__main__":
-    main()
+    polling = run_profiled() if profiling_enabled() else main()
+    # Poll after the page is drawn; the workers, not this script, do the generation
+    if polling:
+        time.sleep(2)
+        st.rerun()
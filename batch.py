@@ -0,0 +1,76 @@
+import contextvars
+import multiprocessing
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+DEFAULT_MAX_IN_FLIGHT = 8
+
+# Slots for LLM requests, shared by everything a batch runs. Jobs that fan out
+# again (sectioned generation, quality repairs) take their requests from the
+# same slots, so the batch's max_in_flight holds however deep it nests.
+_request_slots = contextvars.ContextVar("bvr_request_slots", default=None)
+
+
+def share_request_slots(slots):
+    _request_slots.set(slots)
+
+
+@contextmanager
+def request_slot():
+    slots = _request_slots.get()
+    if slots is None:
+        yield
+        return
+    with slots:
+        yield
+
+
+def _iter_ordered(executor, submit, jobs, window):
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append(submit(executor, job))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# Run fn(*job) for each job with at most max_in_flight calls running at once.
+# Jobs are pulled lazily and results are yielded in input order, so a batch of
+# N jobs takes roughly ceil(N / max_in_flight) round-trips. A few extra jobs are
+# queued behind the workers so one slow call at the head does not idle the rest.
+# Each job runs in a copy of the caller's contextvars, so per-batch state such as
+# metrics labels follows it into the worker thread. The outermost batch also
+# creates the request slots; a nested batch keeps using its caller's.
+def iter_batch(fn, jobs, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    max_in_flight = max(1, int(max_in_flight))
+    slots = _request_slots.get() or threading.BoundedSemaphore(max_in_flight)
+
+    def submit(executor, job):
+        context = contextvars.copy_context()
+        context.run(share_request_slots, slots)
+        return executor.submit(context.run, fn, *job)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        yield from _iter_ordered(executor, submit, jobs, max_in_flight * 2)
+
+
+def run_batch(fn, jobs, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    return list(iter_batch(fn, jobs, max_in_flight))
+
+
+# The same lazy, ordered fan-out over worker processes for CPU-bound work such
+# as document rendering. fn must be a module-level function and the jobs
+# picklable. Workers are spawned rather than forked, since the callers (the
+# Streamlit server, the CLI's batch threads) are multi-threaded.
+def iter_processes(fn, jobs, processes=None):
+    processes = max(1, int(processes or os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        yield from _iter_ordered(executor, lambda executor, job: executor.submit(fn, *job), jobs, processes * 2)
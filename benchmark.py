@@ -0,0 +1,154 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+
+from batch import iter_batch
+from export import FORMATS, export_zip
+from mock_llm_server import MockConfig, start_mock_server
+from scheduler import GenerationError, Scheduler
+
+STRUCTURE = """Introduction
+Top picks based on important aspects
+Things to keep in mind while buying
+Expert tips on maintenance
+FAQs"""
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def build_extractor(url):
+    from generator import ReviewSnippets
+    from providers import LlamaHTTPProvider, Router
+    # Short backoff so injected 429s cost the mock's Retry-After, not minutes
+    router = Router([LlamaHTTPProvider(url, "benchmark")], Scheduler(max_retries=10, base_delay=0.05, max_delay=1.0))
+    return ReviewSnippets(router=router)
+
+
+def bench_generation(extractor, size, concurrency, stream):
+    def generate(topic):
+        started = time.perf_counter()
+        try:
+            if stream:
+                first_token = None
+                parts = []
+                for delta in extractor.stream_blog(topic, STRUCTURE, refresh=True):
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    parts.append(delta)
+                content = "".join(parts)
+            else:
+                first_token = None
+                content = extractor.get_blog(topic, STRUCTURE, refresh=True)
+        except GenerationError:
+            return None, time.perf_counter() - started, None
+        return content, time.perf_counter() - started, first_token
+
+    topics = [(f"Benchmark topic {i}",) for i in range(size)]
+    started = time.perf_counter()
+    results = list(iter_batch(generate, topics, concurrency))
+    elapsed = time.perf_counter() - started
+    latencies = [latency for _, latency, _ in results]
+    first_tokens = [first_token for _, _, first_token in results if first_token is not None]
+    blogs = [(topic, content) for (topic,), (content, _, _) in zip(topics, results) if content is not None]
+    return blogs, {
+        "blogs": size,
+        "failed": size - len(blogs),
+        "seconds": round(elapsed, 3),
+        "blogs_per_sec": round(len(blogs) / elapsed, 2),
+        "p50_latency": round(percentile(latencies, 0.5), 3),
+        "p95_latency": round(percentile(latencies, 0.95), 3),
+        "p95_ttft": round(percentile(first_tokens, 0.95), 3) if first_tokens else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_export(blogs, formats, processes):
+    started = time.perf_counter()
+    archive = export_zip(blogs, formats, processes)
+    archive.seek(0, os.SEEK_END)
+    size = archive.tell()
+    archive.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "export_seconds": round(elapsed, 3),
+        "docs_per_sec": round(len(blogs) / elapsed, 2) if elapsed else None,
+        "zip_mb": round(size / (1024 * 1024), 2),
+        "peak_rss_mb_after_export": peak_rss_mb(),
+    }
+
+
+# Fails when blogs/sec or docs/sec drop, or p95 latency rises, by more than tolerance.
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, row in results.items():
+        base = baseline.get(size)
+        if not base:
+            continue
+        for key in ("blogs_per_sec", "docs_per_sec"):
+            if base.get(key) and row.get(key) is not None and row[key] < base[key] * (1 - tolerance):
+                regressions.append(f"{size} topics: {key} {row[key]} < baseline {base[key]}")
+        if base.get("p95_latency") and row["p95_latency"] > base["p95_latency"] * (1 + tolerance):
+            regressions.append(f"{size} topics: p95_latency {row['p95_latency']} > baseline {base['p95_latency']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generation and DOCX/ZIP export against a local mock LLM.")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="Comma-separated topic counts")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="Benchmark stream_blog instead of get_blog")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock delay before the first token")
+    parser.add_argument("--tps", type=float, default=400.0, help="Mock tokens per second (0 = instant)")
+    parser.add_argument("--tokens", type=int, default=300, help="Mock completion tokens per blog")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock requests answered with 429")
+    parser.add_argument("--formats", default="docx", help=f"Comma-separated export formats ({', '.join(FORMATS)})")
+    parser.add_argument("--export-processes", type=int, default=0, help="Render exports in this many worker processes")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Results file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression against --baseline")
+    args = parser.parse_args(argv)
+
+    server, url = start_mock_server(MockConfig(args.latency, args.tps, args.tokens, args.error_rate))
+    os.environ["BVR_CACHE"] = "0"
+    extractor = build_extractor(url)
+
+    results = {}
+    print(f"{'topics':>7} {'blogs/s':>9} {'p50 s':>8} {'p95 s':>8} {'ttft p95':>9} {'failed':>7} {'docs/s':>9} {'zip MB':>8} {'RSS MB':>8}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        blogs, row = bench_generation(extractor, size, args.concurrency, args.stream)
+        row.update(bench_export(blogs, args.formats.split(","), args.export_processes))
+        results[str(size)] = row
+        print(f"{size:>7} {row['blogs_per_sec']:>9} {row['p50_latency']:>8} {row['p95_latency']:>8} "
+              f"{str(row['p95_ttft']):>9} {row['failed']:>7} {str(row['docs_per_sec']):>9} {row['zip_mb']:>8} "
+              f"{row['peak_rss_mb_after_export']:>8}")
+    print(f"Mock served {server.config.requests} requests, {server.config.rejected} rejected with 429")
+    server.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,9 @@
 import os
 from groq import Groq
 from dotenv import load_dotenv
-from docx import Document
-import re  # Import the re module
+from markdown_render import markdown_to_docx
+from functools import partial
+from scheduler import get_scheduler
 
 class ReviewSnippets:
     def __init__(self):
@@ -14,9 +15,11 @@ class ReviewSnippets:
     def get_blog(self, topic):
         client = Groq(
             api_key=os.getenv("GROQ_API_KEY"),
+            max_retries=0,
         )
 
-        chat_completion = client.chat.completions.create(
+        chat_completion = get_scheduler().call("groq:llama3-70b-8192", partial(
+            client.chat.completions.create,
             messages=[
                 {
                     "role": "system",
@@ -39,27 +42,13 @@ class ReviewSnippets:
                 },
             ],
             model="llama3-70b-8192",
-        )
+        ))
 
         return chat_completion.choices[0].message.content
 
-    # Function to save content to a .doc file with bold formatting
+    # Function to save content to a .docx file, rendering the Markdown formatting
     def save_to_doc(self, content, filename):
-        doc = Document()
-        paragraph = doc.add_paragraph()
-        
-        # Split the content by double asterisks to identify bold text
-        parts = re.split(r'(\*\*.*?\*\*)', content)
-        
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                # Add bold text
-                run = paragraph.add_run(part[2:-2])
-                run.bold = True
-            else:
-                # Add normal text
-                paragraph.add_run(part)
-        
+        doc = markdown_to_docx(content)
         doc.save(filename)
 
 if __name__ == "__main__":
@@ -1,52 +1,38 @@
 import os
-from groq import Groq
 from dotenv import load_dotenv
-from docx import Document
-import re  # Import the re module
+from markdown_render import markdown_to_docx
+from scheduler import get_scheduler
+from prompts import build_messages
+from providers import GroqProvider, Router
 
 class ReviewSnippets:
     def __init__(self):
         load_dotenv()
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.router = Router([GroqProvider(os.getenv("GROQ_API_KEY"))], get_scheduler())
 
     def get_blog(self, topic, structure,description):
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": f'''Generate a blog for my e-commerce site BestViewsReviews for Amazon Products. It is a GenAI platform that analyzes unstructured e-commerce product information like customer reviews, blogs, manufacturer written product descriptions, etc., and generates insights and product recommendations. 
-                    Following is the structure of the blog:
-                    {structure}
-                    Topic: {topic}
-product description: {description}
-'''
-                },
-                {
-                    "role": "user",
-                    "content": f'Topic: {topic}'
-                },
-            ],
-            model="llama3-70b-8192",
-        )
-
-        return chat_completion.choices[0].message.content
+        provider, response = self.router.complete(build_messages(topic, structure, description))
+        usage = response.get("usage") or {}
+        print(f"Tokens used: {usage.get('prompt_tokens')} prompt, {usage.get('completion_tokens')} completion")
+
+        return response["choices"][0]["message"]["content"]
+
+    # Yields content deltas as they arrive instead of waiting for the full completion
+    def stream_blog(self, topic, structure, description):
+        provider, chunks = self.router.open_stream(build_messages(topic, structure, description))
+        usage = None
+        for chunk in chunks:
+            usage = chunk.get("usage") or usage
+            if not chunk.get("choices"):
+                continue
+            delta = chunk["choices"][0]["delta"].get("content")
+            if delta:
+                yield delta
+        if usage is not None:
+            print(f"\nTokens used: {usage.get('prompt_tokens')} prompt, {usage.get('completion_tokens')} completion")
 
     def save_to_doc(self, content, filename):
-        doc = Document()
-        paragraph = doc.add_paragraph()
-        
-        # Split the content by double asterisks to identify bold text
-        parts = re.split(r'(\*\*.*?\*\*)', content)
-        
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                # Add bold text
-                run = paragraph.add_run(part[2:-2])
-                run.bold = True
-            else:
-                # Add normal text
-                paragraph.add_run(part)
-        
+        doc = markdown_to_docx(content)
         doc.save(filename)
 
 if __name__ == "__main__":
@@ -83,8 +69,12 @@ if __name__ == "__main__":
 
 
 
-    blog_content = extractor.get_blog(topic, structure=structure, description=description) 
-    print(blog_content)
+    parts = []
+    for delta in extractor.stream_blog(topic, structure=structure, description=description):
+        print(delta, end="", flush=True)
+        parts.append(delta)
+    print()
+    blog_content = "".join(parts)
 
     # Save the blog content to a .doc file with bold formatting
     output_dir = "output"
@@ -1,50 +1,29 @@
 import os
 from groq import Groq
 from dotenv import load_dotenv
-from docx import Document
-import re  # Import the re module
+from markdown_render import markdown_to_docx
+from functools import partial
+from scheduler import get_scheduler
+from prompts import budget_max_tokens, build_messages
 
 class ReviewSnippets:
     def __init__(self):
         load_dotenv()
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"), max_retries=0)
 
     def get_blog(self, topic, structure):
-        chat_completion = self.client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": f'''Generate a blog for my e-commerce site BestViewsReviews for Amazon Products. It is a GenAI platform that analyzes unstructured e-commerce product information like customer reviews, blogs, manufacturer written product descriptions, etc., and generates insights and product recommendations. 
-                    Following is the structure of the blog:
-                    {structure}
-                    Topic: {topic}'''
-                },
-                {
-                    "role": "user",
-                    "content": f'Topic: {topic}'
-                },
-            ],
+        messages = build_messages(topic, structure)
+        chat_completion = get_scheduler().call("groq:llama3-70b-8192", partial(
+            self.client.chat.completions.create,
+            messages=messages,
             model="llama3-70b-8192",
-        )
+            max_tokens=budget_max_tokens(messages, "llama3-70b-8192"),
+        ))
 
         return chat_completion.choices[0].message.content
 
     def save_to_doc(self, content, filename):
-        doc = Document()
-        paragraph = doc.add_paragraph()
-        
-        # Split the content by double asterisks to identify bold text
-        parts = re.split(r'(\*\*.*?\*\*)', content)
-        
-        for part in parts:
-            if part.startswith('**') and part.endswith('**'):
-                # Add bold text
-                run = paragraph.add_run(part[2:-2])
-                run.bold = True
-            else:
-                # Add normal text
-                paragraph.add_run(part)
-        
+        doc = markdown_to_docx(content)
         doc.save(filename)
 
 if __name__ == "__main__":
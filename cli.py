@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from generator import ReviewSnippets
+from batch import DEFAULT_MAX_IN_FLIGHT, iter_batch
+from scheduler import GenerationError
+from sections import generate_sectioned, merge_usage
+from metrics import batch_context, serve_metrics, summarize
+from retrieval import DEFAULT_CONTEXT_TOKENS, DEFAULT_TOP_K, ProductIndex
+from export import FORMATS, DirectorySink, export_stem, iter_rendered, manifest_entry, write_files, write_manifest
+from quality import DEFAULT_RETRY_BUDGET, MIN_SECTION_WORDS, repair_blog
+
+CHECKPOINT_FILE = "checkpoint.json"
+RESULTS_FILE = "results.jsonl"
+
+
+# Yields the records in results.jsonl, up to byte offset limit when given.
+def read_results(results_path, limit=None):
+    if not os.path.exists(results_path):
+        return
+    offset = 0
+    with open(results_path, "rb") as f:
+        for line in f:
+            offset += len(line)
+            if limit is not None and offset > limit:
+                return
+            yield json.loads(line)
+
+
+def load_checkpoint(out_dir, input_path):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return 0, 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        sys.exit(f"{out_dir} holds a checkpoint for {checkpoint.get('input')}; use a different --out or --restart")
+    return checkpoint["lines_done"], checkpoint["results_offset"]
+
+
+# Written via os.replace so a crash never leaves a half-written checkpoint.
+def save_checkpoint(out_dir, input_path, lines_done, results_offset):
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"input": os.path.abspath(input_path), "lines_done": lines_done, "results_offset": results_offset}, f)
+    os.replace(tmp_path, path)
+
+
+# Lazily yields (line_no, job) pairs, so memory stays flat however long the input is.
+def read_jobs(input_path, skip, default_structure):
+    with open(input_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line_no <= skip:
+                continue
+            line = line.strip()
+            if not line:
+                yield line_no, None
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                job = {"error": f"Invalid JSON: {e}"}
+            if not isinstance(job, dict):
+                job = {"error": "Job must be a JSON object"}
+            if "error" not in job:
+                job.setdefault("structure", default_structure)
+                if not job.get("topic") or not job.get("structure"):
+                    job = {"error": "Job needs a topic and a structure (or pass --structure-file)", **job}
+                elif not all(isinstance(job.get(key), str) for key in ("topic", "structure")) \
+                        or not isinstance(job.get("description") or "", str):
+                    job = {"error": "Job topic, structure and description must be strings", **job}
+            yield line_no, job
+
+
+# Jobs without their own description are grounded in the products the index
+# selects for the topic; their ids are kept in the record. With a retry budget
+# the blog goes through the quality gate and only failing sections are redone.
+def run_job(extractor, line_no, job, refresh, sectioned, retriever=None, top_k=DEFAULT_TOP_K, context_tokens=DEFAULT_CONTEXT_TOKENS,
+            retry_budget=0, min_section_words=MIN_SECTION_WORDS):
+    if job is None or "error" in job:
+        return line_no, job, None
+    started = time.monotonic()
+    description = job.get("description")
+    products = None
+    generate = generate_sectioned if sectioned else ReviewSnippets.complete
+    try:
+        if retriever is not None and not description:
+            description, products = retriever.context(job["topic"], top_k, context_tokens)
+        completion = generate(extractor, job["topic"], job["structure"], refresh=refresh, description=description or None)
+        report = None
+        if retry_budget:
+            report = repair_blog(extractor, job["topic"], job["structure"], completion, description or None,
+                                 retry_budget, min_section_words)
+    except GenerationError as e:
+        return line_no, {**job, **e.to_dict()}, None
+    except Exception as e:
+        # One bad job must not end the whole run
+        return line_no, {**job, "error": f"{type(e).__name__}: {e}", "retryable": False}, None
+    record = {
+        **job,
+        **({"products": products} if products is not None else {}),
+        "content": report.content if report else completion.text,
+        "finish_reason": report.finish_reason if report else completion.finish_reason,
+        **({"quality": {"issues": [issue._asdict() for issue in report.issues], "repairs": report.repairs}} if report else {}),
+        "usage": merge_usage([completion, *report.completions]) if report else completion.usage,
+        "cached": completion.cached and not (report and report.repairs),
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    return line_no, record, record["content"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate BVR blogs in bulk from a JSONL file of {topic, structure, description} jobs.")
+    parser.add_argument("input", help="JSONL file with one job per line")
+    parser.add_argument("--out", default="output", help="Directory for results.jsonl, exported files and the checkpoint")
+    parser.add_argument("--structure-file", help="Blog structure used for jobs that do not set one")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Maximum requests in flight")
+    parser.add_argument("--formats", default="docx", help=f"Comma-separated export formats ({', '.join(FORMATS)}); empty for results.jsonl only")
+    parser.add_argument("--no-docx", action="store_true", help="Leave DOCX out of --formats")
+    parser.add_argument("--export-processes", type=int, default=0, help="Render exports in this many worker processes (0 = in the main process)")
+    parser.add_argument("--refresh", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--sectioned", action="store_true", help="Generate each section of the structure in its own concurrent request")
+    parser.add_argument("--index", help="Product index directory from retrieval.py build, used to ground jobs without a description")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Products retrieved per topic")
+    parser.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS, help="Token budget for retrieved product text")
+    parser.add_argument("--quality", action="store_true", help="Check each blog locally and regenerate only the failing sections")
+    parser.add_argument("--retry-budget", type=int, default=DEFAULT_RETRY_BUDGET, help="Extra requests --quality may spend per blog")
+    parser.add_argument("--min-section-words", type=int, default=MIN_SECTION_WORDS, help="Sections shorter than this fail the quality check")
+    parser.add_argument("--metrics-port", type=int, help="Serve /metrics on this localhost port during the run")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint and start from the first line")
+    args = parser.parse_args(argv)
+    formats = [fmt for fmt in args.formats.split(",") if fmt and not (args.no_docx and fmt == "docx")]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+
+    default_structure = None
+    if args.structure_file:
+        with open(args.structure_file, encoding="utf-8") as f:
+            default_structure = f.read()
+
+    os.makedirs(args.out, exist_ok=True)
+    sink = DirectorySink(args.out)
+    if args.restart and os.path.exists(os.path.join(args.out, CHECKPOINT_FILE)):
+        os.remove(os.path.join(args.out, CHECKPOINT_FILE))
+    lines_done, results_offset = load_checkpoint(args.out, args.input)
+    if lines_done:
+        print(f"Resuming after line {lines_done}", file=sys.stderr)
+
+    extractor = ReviewSnippets()
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    retriever = ProductIndex(args.index) if args.index else None
+    jobs = read_jobs(args.input, lines_done, default_structure)
+    generated = failed = flagged = 0
+
+    results_path = os.path.join(args.out, RESULTS_FILE)
+    # Files are named like export_blogs names them; names taken before a resume stay taken
+    used = {os.path.splitext(os.path.basename(path))[0].lower()
+            for record in read_results(results_path, results_offset) for path in record.get("files", {}).values()}
+    with batch_context("cli") as events, open(results_path, "a+b") as results:
+        # Drop anything written after the last checkpoint before a crash
+        results.truncate(results_offset)
+        results.seek(results_offset)
+        generate = lambda n, job: run_job(extractor, n, job, args.refresh, args.sectioned, retriever, args.top_k, args.context_tokens,
+                                           args.retry_budget if args.quality else 0, args.min_section_words)
+        # Rendering is pipelined behind generation and stays in input order, so
+        # the checkpoint still only moves past lines whose files are written
+        render_jobs = (((line_no, record), (record or {}).get("topic"), content if formats else None)
+                       for line_no, record, content in iter_batch(generate, jobs, args.concurrency))
+        for (line_no, record), files in iter_rendered(render_jobs, formats, args.export_processes):
+            if record is not None:
+                record = {"line": line_no, **record}
+                if record.get("content") is not None:
+                    generated += 1
+                    if record.get("quality", {}).get("issues"):
+                        flagged += 1
+                        print(f"line {line_no}: {len(record['quality']['issues'])} quality issue(s) left", file=sys.stderr)
+                    if files:
+                        record["files"] = write_files(sink, export_stem(record["topic"], used), files, formats)
+                else:
+                    failed += 1
+                    print(f"line {line_no}: {record.get('error')}", file=sys.stderr)
+                results.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                results.flush()
+            save_checkpoint(args.out, args.input, line_no, results.tell())
+
+    if formats:
+        write_manifest(sink, formats, (manifest_entry(record["topic"], record["content"], record["files"])
+                                       for record in read_results(results_path) if record.get("files")))
+    print(f"Generated {generated} blogs ({flagged} with quality issues), {failed} failed; results in {results_path}", file=sys.stderr)
+    for row in summarize(events):
+        print(f"  {row['stage']:<22} n={row['count']:<6} p50={row['p50']:<8} p95={row['p95']:<8} total={row['total']}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import random
+import re
+import zlib
+from collections import namedtuple
+
+STOPWORDS = frozenset("a an and at by for from in of on the to with".split())
+# Words ending in "s" that are not plurals, so "news apps" never merges with
+# "new apps". Words ending in -ss, -us, -is and -sses ("glasses") are left alone
+# too.
+NON_PLURALS = frozenset("""
+    news lens series species means chassis gas bus plus yes bias canvas atlas chaos
+    physics mathematics electronics economics athletics gymnastics aerobics
+    pilates diabetes measles herpes rabies mumps shingles scabies ethos pathos
+""".split())
+NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+# \w misses the combining marks Indic and other scripts build words with (the
+# vowel signs in "मिक्सर"), so their blocks are added explicitly.
+WORD_MARKS = "\u0300-\u036f\u0483-\u0489\u0591-\u05c7\u0610-\u061a\u064b-\u065f\u0900-\u0dff\u0e00-\u0e7f"
+NON_WORD_RE = re.compile(rf"[^\w.{WORD_MARKS}]+")
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+_PRIME = (1 << 61) - 1
+
+Cluster = namedtuple("Cluster", "representative members")
+
+
+def parse_topics(text):
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def stem(word):
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is", "sses")) and word not in NON_PLURALS:
+        return word[:-1]
+    return word
+
+
+# "Best Food Processors in India" and "best food processors india" both become
+# "best food processor india".
+def normalize_topic(topic):
+    words = NON_WORD_RE.sub(" ", topic.lower()).replace(". ", " ").split()
+    return " ".join(stem(word.strip(".")) for word in words if word.strip(".") and word not in STOPWORDS)
+
+
+# Same words in any order, except that a word of five letters or more may be
+# one typo away from its counterpart. Keeps the shingle match from merging short
+# topics that differ by a word ("best new apps", "best news apps").
+def similar_words(a, b):
+    a, b = a.split(), b.split()
+    if len(a) != len(b):
+        return False
+    rest = list(b)
+    typos = []
+    for word in a:
+        if word in rest:
+            rest.remove(word)
+        else:
+            typos.append(word)
+    for word in typos:
+        match = next((other for other in rest if min(len(word), len(other)) >= 5 and _one_edit(word, other)), None)
+        if match is None:
+            return False
+        rest.remove(match)
+    return True
+
+
+def _one_edit(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if len(b) - len(a) > 1:
+        return False
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # One substitution, or one insertion into the shorter word
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingle_set]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.params)
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+# Groups near-duplicate topics, keeping input order: each cluster's
+# representative is its first topic. Exact matches after normalisation are
+# merged directly; the remaining distinct forms go through MinHash LSH and every
+# candidate pair is checked against the real shingle Jaccard, so the threshold
+# is exact rather than probabilistic. Topics with different numbers ("Topic 1",
+# "Top 5 ...") or words (similar_words) are never merged, and neither are topics
+# with nothing left after normalising ("!!!").
+def cluster_topics(topics, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    topics = [topic.strip() for topic in topics if topic.strip()]
+    forms = {}
+    distinct = []
+    form_of = []
+    for topic in topics:
+        form = normalize_topic(topic)
+        if not form or form not in forms:
+            forms[form] = len(distinct)
+            distinct.append(form)
+        form_of.append(forms[form])
+
+    shingle_sets = [shingles(form) for form in distinct]
+    numbers = [tuple(NUMBER_RE.findall(form)) for form in distinct]
+    hasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    buckets = {}
+    union_find = _UnionFind(len(distinct))
+    for i, shingle_set in enumerate(shingle_sets):
+        if not distinct[i]:
+            continue
+        signature = hasher.signature(shingle_set)
+        for band in range(bands):
+            key = (band, signature[band * rows:(band + 1) * rows])
+            for j in buckets.setdefault(key, []):
+                if (numbers[i] == numbers[j] and union_find.find(i) != union_find.find(j)
+                        and jaccard(shingle_set, shingle_sets[j]) >= threshold and similar_words(distinct[i], distinct[j])):
+                    union_find.union(i, j)
+            buckets[key].append(i)
+
+    clusters = {}
+    for topic, form in zip(topics, form_of):
+        clusters.setdefault(union_find.find(form), []).append(topic)
+    return [Cluster(members[0], members) for members in clusters.values()]
+
+
+# Maps each representative to the other topics in its cluster.
+def cluster_aliases(clusters):
+    return {cluster.representative: cluster.members[1:] for cluster in clusters if len(cluster.members) > 1}
+
+
+# Repeats each (topic, value) for the topic's duplicates so they get the same result.
+def expand_results(results, aliases):
+    expanded = []
+    for topic, value in results:
+        expanded.append((topic, value))
+        for alias in (aliases or {}).get(topic, ()):
+            if alias != topic:
+                expanded.append((alias, value))
+    return expanded
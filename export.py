@@ -0,0 +1,212 @@
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from batch import iter_processes
+
+# Archives smaller than this stay in memory; larger ones roll over to a temp file.
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+FORMATS = ("docx", "html", "md")
+MANIFEST_NAME = "manifest.json"
+# Below this many blogs a process pool costs more to start than it saves
+PROCESS_POOL_THRESHOLD = 16
+# HTML and Markdown are plain string work; only DOCX is worth a process pool
+POOLED_FORMATS = ("docx",)
+
+
+def content_digest(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def export_stem(topic, used):
+    stem = re.sub(r"[\\/:*?\"<>|\x00-\x1f]+", "_", topic).strip(" ._")[:100] or "blog"
+    candidate = stem
+    counter = 2
+    while candidate.lower() in used:
+        candidate = f"{stem} ({counter})"
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _html_inline(text):
+    from markdown_render import iter_inline
+    parts = []
+    for span in iter_inline(text):
+        piece = html.escape(span.text).replace("\n", "<br>\n")
+        if span.code:
+            piece = f"<code>{piece}</code>"
+        if span.italic:
+            piece = f"<em>{piece}</em>"
+        if span.bold:
+            piece = f"<strong>{piece}</strong>"
+        if span.url:
+            piece = f'<a href="{html.escape(span.url, quote=True)}">{piece}</a>'
+        parts.append(piece)
+    return "".join(parts)
+
+
+# Same block/inline tokenizer as the DOCX renderer, so both exports agree on
+# what counts as a heading, list or emphasis. Lists nest by indent level.
+def render_html(text, title):
+    from markdown_render import iter_blocks
+    body = []
+    open_lists = []
+    for block in iter_blocks(text):
+        kind = {"bullet": "ul", "number": "ol"}.get(block.kind)
+        depth = block.level + 1 if kind else 0
+        while len(open_lists) > depth or (open_lists and len(open_lists) == depth and open_lists[-1] != kind):
+            body.append(f"</li></{open_lists.pop()}>")
+        if kind:
+            if len(open_lists) == depth:
+                body.append("</li>")
+            while len(open_lists) < depth:
+                start = f' start="{block.number}"' if kind == "ol" and block.number not in (None, 1) and len(open_lists) == depth - 1 else ""
+                body.append(f"<{kind}{start}>")
+                open_lists.append(kind)
+            body.append(f"<li>{_html_inline(block.text)}")
+        elif block.kind == "heading":
+            level = min(block.level, 6)
+            body.append(f"<h{level}>{_html_inline(block.text)}</h{level}>")
+        elif block.kind == "rule":
+            body.append("<hr>")
+        else:
+            body.append(f"<p>{_html_inline(block.text)}</p>")
+    while open_lists:
+        body.append(f"</li></{open_lists.pop()}>")
+    return (f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+            f"</head>\n<body>\n" + "\n".join(body) + "\n</body>\n</html>\n")
+
+
+def render_docx_bytes(text):
+    from markdown_render import markdown_to_docx
+    doc_io = BytesIO()
+    markdown_to_docx(text).save(doc_io)
+    return doc_io.getvalue()
+
+
+# Renders one blog into every requested format. Module-level and free of app
+# state so it can run in a worker process; key is passed through untouched and
+# a None content renders nothing.
+def render_blog(key, topic, content, formats):
+    files = {}
+    if content is None:
+        return key, files
+    for fmt in formats:
+        if fmt == "docx":
+            files[fmt] = render_docx_bytes(content)
+        elif fmt == "html":
+            files[fmt] = render_html(content, topic).encode("utf-8")
+        elif fmt == "md":
+            files[fmt] = (content.strip() + "\n").encode("utf-8")
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+    return key, files
+
+
+# Yields (key, files) for (key, topic, content) jobs in order. Large batches
+# render in a process pool, a window at a time, so memory stays bounded.
+def iter_rendered(jobs, formats, processes=None):
+    jobs = ((key, topic, content, tuple(formats)) for key, topic, content in jobs)
+    if processes and processes > 1:
+        return iter_processes(render_blog, jobs, processes)
+    return (render_blog(*job) for job in jobs)
+
+
+class ZipSink:
+    def __init__(self, fileobj):
+        self.zip_file = ZipFile(fileobj, "w", compression=ZIP_DEFLATED)
+
+    def write(self, name, data):
+        self.zip_file.writestr(name, data)
+
+    def close(self):
+        self.zip_file.close()
+
+
+# Files are written under a temporary name and renamed, so an interrupted
+# export never leaves a truncated document behind.
+class DirectorySink:
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, name, data):
+        path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        pass
+
+
+# Writes one blog's rendered files as <format>/<stem>.<format>, in format
+# order, and returns their paths.
+def write_files(sink, stem, files, formats=FORMATS):
+    paths = {}
+    for fmt in formats:
+        if fmt in files:
+            paths[fmt] = f"{fmt}/{stem}.{fmt}"
+            sink.write(paths[fmt], files[fmt])
+    return paths
+
+
+def manifest_entry(topic, content, paths):
+    return {"topic": topic, "sha256": content_digest(content), "words": len(content.split()), "files": paths}
+
+
+def write_manifest(sink, formats, entries):
+    manifest = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "formats": list(formats), "blogs": list(entries)}
+    sink.write(MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+    return manifest
+
+
+# Renders (topic, content) blogs into sink as <format>/<name>.<ext> plus a
+# manifest.json listing every blog and its files. Only the blogs currently in
+# the render window are held in memory. prerendered maps a format to a
+# fn(topic, content) that returns its bytes (e.g. from a cache); those formats
+# are not rendered again. Returns the manifest.
+def export_blogs(blogs, sink, formats=FORMATS, processes=None, prerendered=None):
+    prerendered = {fmt: fn for fmt, fn in (prerendered or {}).items() if fmt in formats}
+    used = set()
+    entries = []
+    names = {}
+
+    def jobs():
+        for topic, content in blogs:
+            stem = export_stem(topic, used)
+            names[stem] = (topic, content)
+            yield stem, topic, content
+
+    rendered = [fmt for fmt in formats if fmt not in prerendered]
+    for stem, files in iter_rendered(jobs(), rendered, processes if rendered else None):
+        topic, content = names.pop(stem)
+        files.update((fmt, fn(topic, content)) for fmt, fn in prerendered.items())
+        entries.append(manifest_entry(topic, content, write_files(sink, stem, files, formats)))
+    return write_manifest(sink, formats, entries)
+
+
+def export_zip(blogs, formats=FORMATS, processes=None, spool_max_size=SPOOL_MAX_SIZE, prerendered=None):
+    archive = SpooledTemporaryFile(max_size=spool_max_size)
+    sink = ZipSink(archive)
+    try:
+        export_blogs(blogs, sink, formats, processes, prerendered)
+    finally:
+        sink.close()
+    archive.seek(0)
+    return archive
+
+
+# formats are the ones that will actually be rendered (not prerendered).
+def pool_size(count, formats=FORMATS):
+    if count < PROCESS_POOL_THRESHOLD or not any(fmt in POOLED_FORMATS for fmt in formats):
+        return None
+    return os.cpu_count()
@@ -0,0 +1,140 @@
+import json
+import time
+from functools import lru_cache
+from io import BytesIO
+
+from batch import request_slot
+from cache import ResponseCache, request_key
+from scheduler import GenerationError, get_scheduler
+from sections import generate_sectioned
+from prompts import DEFAULT_MAX_TOKENS, UsageTracker, build_messages, completion_from_response, count_message_tokens, count_tokens
+from providers import Router, providers_from_env
+from metrics import get_metrics
+
+
+# .env is read once per process rather than on every ReviewSnippets()
+@lru_cache(maxsize=None)
+def load_config():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+class ReviewSnippets:
+    def __init__(self, client=None, cache=None, router=None):
+        load_config()
+        self.cache = cache if cache is not None else ResponseCache.from_env()
+        self.router = router or Router(providers_from_env(client), get_scheduler())
+        self.usage = UsageTracker()
+        self.metrics = get_metrics()
+
+    # Keyed on the configured backend set rather than the one that served the
+    # call, so routing decisions do not fragment the cache.
+    def _request(self, topic, structure, description=None, section=None):
+        with self.metrics.timer("prompt_build"):
+            request = {
+                "temperature": 0.7,
+                "top_p": 0.95,
+                "messages": build_messages(topic, structure, description, section),
+                "max_tokens": DEFAULT_MAX_TOKENS
+            }
+            cache_key = request_key({"backends": self.router.keys(), **request})
+        return request, cache_key
+
+    def _cached(self, cache_key, refresh, estimated):
+        if self.cache is None or refresh:
+            return None
+        response_json = self.cache.get(cache_key)
+        if response_json is None:
+            return None
+        return completion_from_response(response_json, estimated, cached=True)
+
+    # Returns a Completion with the text, finish_reason and token usage.
+    def complete(self, topic, structure, refresh=False, description=None, section=None):
+        request, cache_key = self._request(topic, structure, description, section)
+        label = topic if section is None else f"{topic} / {section.title}"
+        estimated = count_message_tokens(request['messages'])
+        completion = self._cached(cache_key, refresh, estimated)
+        if completion is not None:
+            self.usage.record(label, completion)
+            return completion
+
+        with request_slot():
+            provider, response_json = self.router.complete(**request)
+        try:
+            completion = completion_from_response(response_json, estimated)
+        except (KeyError, IndexError, TypeError):
+            raise GenerationError(f"Malformed response from {provider.key}: {json.dumps(response_json)[:200]}")
+        if self.cache is not None:
+            self.cache.put(cache_key, response_json)
+        self.usage.record(label, completion)
+        return completion
+
+    def get_blog(self, topic, structure, refresh=False, description=None, section=None):
+        return self.complete(topic, structure, refresh, description, section).text
+
+    # Yields the blog incrementally as the backend streams it. The assembled
+    # text is cached under the same key as get_blog. Fallback and retries only
+    # apply until the stream opens; a failure mid-stream raises GenerationError.
+    def stream_blog(self, topic, structure, refresh=False, description=None):
+        request, cache_key = self._request(topic, structure, description)
+        estimated = count_message_tokens(request['messages'])
+        completion = self._cached(cache_key, refresh, estimated)
+        if completion is not None:
+            self.usage.record(topic, completion)
+            yield completion.text
+            return
+
+        started = time.perf_counter()
+        provider, chunks = self.router.open_stream(**request)
+        first_token_at = None
+        parts = []
+        finish_reason = None
+        usage = None
+        try:
+            for chunk in chunks:
+                usage = chunk.get('usage') or usage
+                if not chunk.get('choices'):
+                    continue
+                choice = chunk['choices'][0]
+                finish_reason = choice.get('finish_reason') or finish_reason
+                delta = (choice.get('delta') or {}).get('content')
+                if delta:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        self.metrics.observe("time_to_first_token", first_token_at - started, provider.key)
+                    parts.append(delta)
+                    yield delta
+        except GenerationError:
+            raise
+        except Exception as e:
+            raise GenerationError(f"Stream from {provider.key} interrupted: {e}", retryable=True) from e
+
+        finished = time.perf_counter()
+        self.metrics.observe("stream_total", finished - started, provider.key)
+        if first_token_at is not None:
+            completion_tokens = (usage or {}).get('completion_tokens') or count_tokens("".join(parts))
+            self.metrics.observe_throughput(provider.key, completion_tokens, finished - first_token_at)
+
+        response_json = {
+            "choices": [{"message": {"role": "assistant", "content": "".join(parts)}, "finish_reason": finish_reason}],
+            "usage": usage
+        }
+        if self.cache is not None and parts:
+            self.cache.put(cache_key, response_json)
+        self.usage.record(topic, completion_from_response(response_json, estimated))
+
+    def save_to_doc(self, content, topic):
+        from markdown_render import markdown_to_docx
+        with self.metrics.timer("docx_render"):
+            doc = markdown_to_docx(content)
+
+            doc_io = BytesIO()
+            doc.save(doc_io)
+        doc_io.seek(0)
+        return doc_io
+
+
+def generate_blog(extractor, topic, structure, refresh=False, sectioned=False, description=None):
+    if sectioned:
+        return generate_sectioned(extractor, topic, structure, refresh=refresh, description=description)
+    return extractor.complete(topic, structure, refresh=refresh, description=description)
@@ -0,0 +1,45 @@
+import os
+import threading
+
+import httpx
+
+_client = None
+_lock = threading.Lock()
+
+
+def _env_float(name, default):
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client():
+    limits = httpx.Limits(
+        max_connections=int(_env_float("LLM_HTTP_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(_env_float("LLM_HTTP_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=_env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 30.0),
+    )
+    timeout = httpx.Timeout(
+        _env_float("LLM_HTTP_READ_TIMEOUT", 120.0),
+        connect=_env_float("LLM_HTTP_CONNECT_TIMEOUT", 10.0),
+    )
+    # HTTP/2 is negotiated via ALPN, so endpoints without it fall back to HTTP/1.1.
+    http2 = os.getenv("LLM_HTTP2", "1") != "0" and _http2_available()
+    return httpx.Client(http2=http2, limits=limits, timeout=timeout)
+
+
+# One keep-alive pool per process, shared by every ReviewSnippets instance and
+# worker thread so repeated requests skip the TCP+TLS handshake.
+def get_http_client():
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = create_http_client()
+        return _client
@@ -0,0 +1,281 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from scheduler import GenerationError
+
+DEFAULT_QUEUE_PATH = os.path.join(".cache", "jobs.sqlite3")
+DEFAULT_LEASE = 900.0
+DEFAULT_MAX_ATTEMPTS = 3
+WORKER_STALE_AFTER = 30.0
+HEARTBEAT_INTERVAL = 10.0
+SHUTDOWN_GRACE = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    total INTEGER NOT NULL,
+    options TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    structure TEXT NOT NULL,
+    description TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, id);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch_id, position);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+# SQLite-backed job queue shared by the UI and any number of worker processes.
+# Each process opens its own connection; claims run inside BEGIN IMMEDIATE so
+# two workers never take the same job. Leases are renewed by each worker
+# process's heartbeat thread, so a job whose worker died is picked up again once
+# its lease expires, until it has used max_attempts.
+class JobQueue:
+    def __init__(self, path=None):
+        self.path = path or os.getenv("BVR_QUEUE_PATH", DEFAULT_QUEUE_PATH)
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, jobs, options=None):
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        rows = [(batch_id, position, job["topic"], job["structure"], job.get("description"), now)
+                for position, job in enumerate(jobs)]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("INSERT INTO batches (id, created_at, total, options) VALUES (?, ?, ?, ?)",
+                               (batch_id, now, len(rows), json.dumps(options or {})))
+            self._conn.executemany(
+                "INSERT INTO jobs (batch_id, position, topic, structure, description, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+            self._conn.execute("COMMIT")
+        return batch_id
+
+    def claim(self, worker_id, lease=DEFAULT_LEASE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? "
+                    "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                    (json.dumps({"error": "Worker stopped before finishing the job", "retryable": False, "attempts": max_attempts}),
+                     now, now, max_attempts))
+                row = self._conn.execute(
+                    "SELECT jobs.id, jobs.topic, jobs.structure, jobs.description, batches.options FROM jobs "
+                    "JOIN batches ON batches.id = jobs.batch_id "
+                    "WHERE jobs.status = 'queued' OR (jobs.status = 'running' AND jobs.lease_until < ?) "
+                    "ORDER BY jobs.id LIMIT 1", (now,)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "updated_at = ? WHERE id = ?", (worker_id, now + lease, now, row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "topic": row[1], "structure": row[2], "description": row[3], "options": json.loads(row[4])}
+
+    def complete(self, job_id, result):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id))
+
+    # Retryable errors go back to the queue until max_attempts is used up.
+    def fail(self, job_id, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        with self._lock:
+            attempts = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            status = "queued" if error.get("retryable") and attempts < max_attempts else "failed"
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, json.dumps(error), time.time(), job_id))
+
+    # Marks the workers alive and extends the leases of the jobs they are running.
+    def heartbeat(self, worker_ids, lease=DEFAULT_LEASE):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO workers (id, last_seen) VALUES (?, ?)",
+                                       [(worker_id, now) for worker_id in worker_ids])
+                self._conn.executemany("UPDATE jobs SET lease_until = ? WHERE status = 'running' AND worker = ?",
+                                       [(now + lease, worker_id) for worker_id in worker_ids])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # Hands the workers' running jobs back to the queue after a clean shutdown,
+    # without counting the interrupted run as an attempt.
+    def release(self, worker_ids):
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, attempts = MAX(attempts - 1, 0), "
+                "updated_at = ? WHERE status = 'running' AND worker = ?",
+                [(time.time(), worker_id) for worker_id in worker_ids])
+
+    def live_workers(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM workers WHERE last_seen > ?",
+                                      (time.time() - WORKER_STALE_AFTER,)).fetchone()[0]
+
+    def batch_status(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY status",
+                                      (batch_id,)).fetchall()
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update(dict(rows))
+        counts["total"] = sum(count for _, count in rows)
+        return counts
+
+    # Yields (topic, result, error) in submission order without loading the whole batch.
+    def batch_results(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT topic, status, result, error FROM jobs WHERE batch_id = ? ORDER BY position",
+                (batch_id,)).fetchall()
+        for topic, status, result, error in rows:
+            yield topic, json.loads(result) if status == "done" else None, json.loads(error) if status == "failed" else None
+
+
+def error_from_dict(error):
+    return GenerationError(error.get("error", "Unknown error"), error.get("status"), error.get("retryable", False),
+                           error.get("attempts", 1))
+
+
+def process_job(extractor, job):
+    from sections import generate_sectioned, merge_usage
+    options = job["options"]
+    generate = generate_sectioned if options.get("sectioned") else type(extractor).complete
+    completion = generate(extractor, job["topic"], job["structure"], refresh=options.get("refresh", False),
+                          description=job.get("description"))
+    result = {"content": completion.text, "finish_reason": completion.finish_reason, "usage": completion.usage,
+              "cached": completion.cached}
+    if options.get("retry_budget"):
+        from quality import repair_blog
+        report = repair_blog(extractor, job["topic"], job["structure"], completion, job.get("description"), options["retry_budget"])
+        result.update(content=report.content, finish_reason=report.finish_reason,
+                      usage=merge_usage([completion, *report.completions]), cached=completion.cached and not report.repairs,
+                      quality={"issues": [issue._asdict() for issue in report.issues], "repairs": report.repairs})
+    return result
+
+
+def _work(queue_path, worker_id, stop, poll_interval, slots):
+    from generator import ReviewSnippets
+    from batch import share_request_slots
+    share_request_slots(slots)
+    queue = JobQueue(queue_path)
+    extractor = ReviewSnippets()
+    while not stop.is_set():
+        job = queue.claim(worker_id)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        try:
+            queue.complete(job["id"], process_job(extractor, job))
+        except GenerationError as e:
+            queue.fail(job["id"], e.to_dict())
+        except Exception as e:
+            queue.fail(job["id"], {"error": f"{type(e).__name__}: {e}", "retryable": False})
+
+
+# Jobs can run far longer than WORKER_STALE_AFTER, so liveness and leases are
+# kept up by this thread rather than between jobs.
+def _heartbeat(queue_path, workers, stop):
+    queue = JobQueue(queue_path)
+    while True:
+        queue.heartbeat([worker_id for worker_id, thread in workers.items() if thread.is_alive()])
+        if stop.wait(HEARTBEAT_INTERVAL):
+            return
+
+
+# One process per core by default, each running a few threads so network-bound
+# jobs overlap. Each thread registers as its own worker; together they have at
+# most `threads` LLM requests in flight, sectioned jobs included.
+def run_worker_process(queue_path, threads, poll_interval):
+    stop = threading.Event()
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    slots = threading.BoundedSemaphore(threads)
+    workers = {f"{prefix}-{i}": threading.Thread(target=_work, args=(queue_path, f"{prefix}-{i}", stop, poll_interval, slots), daemon=True)
+               for i in range(threads)}
+    pool = list(workers.values())
+    for thread in pool:
+        thread.start()
+    threading.Thread(target=_heartbeat, args=(queue_path, workers, stop), daemon=True).start()
+    try:
+        while any(thread.is_alive() for thread in pool):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Let jobs that are about to finish complete, then requeue the rest
+        # before the daemon threads die with the process
+        stop.set()
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        for thread in pool:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        JobQueue(queue_path).release(list(workers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background workers for the BVR blog job queue.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    worker = subparsers.add_parser("worker", help="Process queued generation jobs")
+    worker.add_argument("--queue", default=None, help="Queue database path (default $BVR_QUEUE_PATH or .cache/jobs.sqlite3)")
+    worker.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    worker.add_argument("--threads", type=int, default=4, help="Concurrent jobs per process")
+    worker.add_argument("--poll-interval", type=float, default=1.0)
+    status = subparsers.add_parser("status", help="Show a batch's progress")
+    status.add_argument("batch_id")
+    status.add_argument("--queue", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        print(json.dumps(JobQueue(args.queue).batch_status(args.batch_id)))
+        return 0
+
+    JobQueue(args.queue)  # create the schema once before the workers race for it
+    processes = [multiprocessing.Process(target=run_worker_process, args=(args.queue, args.threads, args.poll_interval))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
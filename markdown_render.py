@@ -0,0 +1,243 @@
+import re
+from collections import namedtuple
+from io import BytesIO
+
+from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import RGBColor
+
+from sections import BlogTree
+
+Block = namedtuple("Block", "kind level text number", defaults=(None,))
+Span = namedtuple("Span", "text bold italic code url")
+
+# One match per line classifies it as a heading, list item, rule or plain text
+BLOCK_RE = re.compile(
+    r"(?P<indent>[ \t]*)(?:"
+    r"(?P<rule>(?:\*[ \t]*){3,}|(?:-[ \t]*){3,}|(?:_[ \t]*){3,})$"
+    r"|(?P<heading>#{1,6})[ \t]+"
+    r"|(?P<bullet>[-*+•])[ \t]+"
+    r"|(?P<number>\d{1,3})[.)][ \t]+"
+    r")?(?P<text>.*)"
+)
+
+# Emphasis, code and links in one alternation, scanned left to right once per line.
+# A closing marker is never followed by another marker character, so nested
+# emphasis ("**bold *italic***", "*italic **bold***") closes on the outer one.
+INLINE_RE = re.compile(
+    r"\*\*(?P<bold>.+?\*?)\*\*(?!\*)"
+    r"|__(?P<bold_u>.+?_?)__(?!_)"
+    r"|\*(?P<italic>[^\s*](?:.*?[^\s*])??(?:\*\*)?)\*(?!\*)"
+    r"|(?<!\w)_(?P<italic_u>[^\s_](?:.*?[^\s_])??(?:__)?)_(?!\w)"
+    r"|`(?P<code>[^`]+)`"
+    r"|\[(?P<link>[^\]]+)\]\((?P<url>[^)\s]+)\)"
+)
+
+
+def _indent_level(indent):
+    return min(len(indent.replace("\t", "    ")) // 2, 2)
+
+
+# Yields Blocks for headings, bullet/number list items, rules and paragraphs.
+# Consecutive plain lines form one paragraph and keep their line breaks.
+def iter_blocks(text):
+    paragraph = []
+    for line in text.splitlines():
+        if not line.strip():
+            if paragraph:
+                yield Block("paragraph", 0, "\n".join(paragraph))
+                paragraph = []
+            continue
+        match = BLOCK_RE.match(line)
+        if match.group("rule") is None and match.group("heading") is None \
+                and match.group("bullet") is None and match.group("number") is None:
+            paragraph.append(line.strip())
+            continue
+        if paragraph:
+            yield Block("paragraph", 0, "\n".join(paragraph))
+            paragraph = []
+        if match.group("rule") is not None:
+            yield Block("rule", 0, "")
+        elif match.group("heading"):
+            yield Block("heading", len(match.group("heading")), match.group("text").strip().rstrip("#").strip())
+        elif match.group("bullet"):
+            yield Block("bullet", _indent_level(match.group("indent")), match.group("text").strip())
+        else:
+            yield Block("number", _indent_level(match.group("indent")), match.group("text").strip(), int(match.group("number")))
+    if paragraph:
+        yield Block("paragraph", 0, "\n".join(paragraph))
+
+
+def iter_inline(text, bold=False, italic=False):
+    pos = 0
+    for match in INLINE_RE.finditer(text):
+        if match.start() > pos:
+            yield Span(text[pos:match.start()], bold, italic, False, None)
+        kind = match.lastgroup
+        if kind in ("bold", "bold_u"):
+            yield from iter_inline(match.group(kind), True, italic)
+        elif kind in ("italic", "italic_u"):
+            yield from iter_inline(match.group(kind), bold, True)
+        elif kind == "code":
+            yield Span(match.group("code"), bold, italic, True, None)
+        else:
+            yield Span(match.group("link"), bold, italic, False, match.group("url"))
+        pos = match.end()
+    if pos < len(text):
+        yield Span(text[pos:], bold, italic, False, None)
+
+
+def _add_text(paragraph, text, span):
+    run = paragraph.add_run(text)
+    run.bold = span.bold or None
+    run.italic = span.italic or None
+    if span.code:
+        run.font.name = "Consolas"
+    return run
+
+
+def _add_hyperlink(paragraph, span):
+    r_id = paragraph.part.relate_to(span.url, RT.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = _add_text(paragraph, span.text, span)
+    run.font.underline = True
+    run.font.color.rgb = RGBColor(0x05, 0x63, 0xC1)
+    hyperlink.append(run._r)
+    paragraph._p.append(hyperlink)
+
+
+def _add_spans(paragraph, text):
+    for span in iter_inline(text):
+        if span.url:
+            _add_hyperlink(paragraph, span)
+            continue
+        lines = span.text.split("\n")
+        for i, line in enumerate(lines):
+            run = _add_text(paragraph, line, span)
+            if i < len(lines) - 1:
+                run.add_break()
+
+
+# Word continues 'List Number' across the whole document, so each new numbered
+# list gets its own w:num starting at the number the model wrote.
+def _restart_numbering(doc, paragraph, start):
+    try:
+        num_id = paragraph.style.element.pPr.numPr.numId.val
+        numbering = doc.part.numbering_part.numbering_definitions._numbering
+        abstract_id = numbering.num_having_numId(num_id).abstractNumId.val
+    except (AttributeError, KeyError, NotImplementedError):
+        return None
+    num = numbering.add_num(abstract_id)
+    num.add_lvlOverride(ilvl=0).add_startOverride(start)
+    return num.numId
+
+
+def _set_numbering(paragraph, num_id):
+    num_pr = paragraph._p.get_or_add_pPr().get_or_add_numPr()
+    num_pr.get_or_add_ilvl().val = 0
+    num_pr.get_or_add_numId().val = num_id
+
+
+# python-docx resolves a style name by scanning every style in the document on
+# each paragraph, so ids are looked up once per render and set directly.
+def _style_id(doc, style_ids, base, level=0):
+    name = base if level == 0 else f"{base} {level + 1}"
+    if name not in style_ids:
+        style_ids[name] = doc.styles[name].style_id if name in doc.styles else _style_id(doc, style_ids, base)
+    return style_ids[name]
+
+
+def _add_paragraph(doc, style_id=None):
+    paragraph = doc.add_paragraph()
+    if style_id is not None:
+        paragraph._p.style = style_id
+    return paragraph
+
+
+def render_docx(doc, text):
+    num_id = None
+    next_number = None
+    style_ids = {}
+    for block in iter_blocks(text):
+        if block.kind == "heading":
+            paragraph = _add_paragraph(doc, _style_id(doc, style_ids, f"Heading {min(block.level, 9)}"))
+        elif block.kind == "bullet":
+            paragraph = _add_paragraph(doc, _style_id(doc, style_ids, "List Bullet", block.level))
+        elif block.kind == "number":
+            paragraph = _add_paragraph(doc, _style_id(doc, style_ids, "List Number", block.level))
+            if block.level == 0:
+                if num_id is None or block.number != next_number:
+                    num_id = _restart_numbering(doc, paragraph, block.number)
+                next_number = block.number + 1
+                if num_id is not None:
+                    _set_numbering(paragraph, num_id)
+        elif block.kind == "rule":
+            doc.add_paragraph("_" * 40)
+            continue
+        else:
+            paragraph = doc.add_paragraph()
+        _add_spans(paragraph, block.text)
+    return doc
+
+
+def markdown_to_docx(text):
+    return render_docx(Document(), text)
+
+
+# A DOCX kept alongside its BlogTree so one section can be swapped without
+# re-rendering the rest. Every chunk is rendered separately and its body
+# elements remembered; replacing a section renders only the new chunks and
+# moves them into place. Lists never span a heading, so chunk-by-chunk
+# rendering matches markdown_to_docx.
+class BlogDocument:
+    def __init__(self, text):
+        self.doc = Document()
+        self.tree = BlogTree(text)
+        self.chunks = [self._render(chunk) for chunk in self.tree.chunk_texts()]
+        self._bytes = None
+
+    # New paragraphs go in before the trailing sectPr, so the rendered
+    # elements are the run of children just ahead of it.
+    def _render(self, text):
+        body = self.doc.element.body
+        before = len(body)
+        render_docx(self.doc, text)
+        end = len(body) - (1 if len(body) and body[-1].tag == qn("w:sectPr") else 0)
+        return list(body[end - (len(body) - before):end])
+
+    def replace_section(self, section_id, text):
+        first, last = self.tree.find(section_id).chunks
+        tree = self.tree.replace(section_id, text)
+        new_count = len(tree.headings) - len(self.tree.headings) + (last - first)
+        old_headings = [heading[1:] for heading in self.tree.headings]
+        new_headings = [heading[1:] for heading in tree.headings]
+        if new_count < 1 or new_headings[:first] != old_headings[:first] \
+                or new_headings[first + new_count:] != old_headings[last:]:
+            # The reply changed the heading layout around it; fall back to a full render
+            self.__init__(tree.text())
+            return tree
+
+        texts = tree.chunk_texts()
+        rendered = [self._render(texts[k + 1]) for k in range(first, first + new_count)]
+        old = self.chunks[first + 1:last + 1]
+        anchor = old[0][0]
+        for chunk in rendered:
+            for element in chunk:
+                anchor.addprevious(element)
+        for chunk in old:
+            for element in chunk:
+                element.getparent().remove(element)
+        self.chunks[first + 1:last + 1] = rendered
+        self.tree = tree
+        self._bytes = None
+        return tree
+
+    def to_bytes(self):
+        if self._bytes is None:
+            doc_io = BytesIO()
+            self.doc.save(doc_io)
+            self._bytes = doc_io.getvalue()
+        return self._bytes
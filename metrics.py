@@ -0,0 +1,209 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("bvr.metrics")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+# Set per batch by batch_context(); batch.iter_batch copies them into workers.
+_mode = contextvars.ContextVar("bvr_metrics_mode", default="default")
+_events = contextvars.ContextVar("bvr_metrics_events", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels):
+        key = tuple(labels.get(name, "none") for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total, count) in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, key))
+            sep = "," if labels else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return "\n".join(lines)
+
+
+class Metrics:
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "bvr_stage_seconds", "Time spent in each generation pipeline stage",
+            ("stage", "model", "mode"), SECONDS_BUCKETS)
+        self.tokens_per_second = Histogram(
+            "bvr_completion_tokens_per_second", "Completion throughput per LLM call",
+            ("model", "mode"), TOKENS_PER_SECOND_BUCKETS)
+
+    def _emit(self, event):
+        events = _events.get()
+        if events is not None:
+            events.append(event)
+        logger.info(json.dumps(event))
+
+    def observe(self, stage, seconds, model="none"):
+        mode = _mode.get()
+        self.stage_seconds.observe(seconds, {"stage": stage, "model": model, "mode": mode})
+        self._emit({"event": "stage", "stage": stage, "seconds": round(seconds, 4), "model": model, "mode": mode})
+
+    def observe_throughput(self, model, completion_tokens, seconds):
+        if not completion_tokens or seconds <= 0:
+            return
+        mode = _mode.get()
+        rate = completion_tokens / seconds
+        self.tokens_per_second.observe(rate, {"model": model, "mode": mode})
+        self._emit({"event": "throughput", "tokens_per_second": round(rate, 1), "model": model, "mode": mode})
+
+    @contextmanager
+    def timer(self, stage, model="none"):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, model)
+
+    def render_prometheus(self):
+        return self.stage_seconds.render() + "\n" + self.tokens_per_second.render() + "\n"
+
+    # Written via os.replace so a scraper never reads a partial file
+    def write_file(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        path = os.getenv("METRICS_FILE")
+        if path:
+            self.write_file(path)
+
+
+# Labels everything observed inside it with mode and collects the events, which
+# summarize() turns into the per-batch panel.
+@contextmanager
+def batch_context(mode):
+    events = []
+    mode_token = _mode.set(mode)
+    events_token = _events.set(events)
+    try:
+        yield events
+    finally:
+        _events.reset(events_token)
+        _mode.reset(mode_token)
+        get_metrics().flush()
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(events):
+    by_stage = {}
+    for event in events:
+        if event["event"] == "stage":
+            by_stage.setdefault(event["stage"], []).append(event["seconds"])
+        elif event["event"] == "throughput":
+            by_stage.setdefault("tokens_per_second", []).append(event["tokens_per_second"])
+    rows = []
+    for stage, values in by_stage.items():
+        values.sort()
+        rows.append({
+            "stage": stage,
+            "count": len(values),
+            "p50": round(_percentile(values, 0.5), 3),
+            "p95": round(_percentile(values, 0.95), 3),
+            "max": round(values[-1], 3),
+            "total": round(sum(values), 3),
+        })
+    return rows
+
+
+def start_http_server(port, metrics=None, host="127.0.0.1"):
+    metrics = metrics or get_metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+_server = None
+
+
+# METRICS_FILE gets the Prometheus text after every batch and METRICS_LOG=1
+# prints the structured stage events to stderr. The HTTP endpoint is only
+# started by serve_metrics, so worker processes never compete for the port.
+def get_metrics():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if os.getenv("METRICS_LOG") == "1" and not logger.handlers:
+                logger.addHandler(logging.StreamHandler())
+                logger.setLevel(logging.INFO)
+        return _metrics
+
+
+# Serves /metrics on port (default METRICS_PORT) and METRICS_HOST (default
+# localhost), once per process. A port that is already taken is logged, not
+# raised, so a second app or CLI run still works without the endpoint.
+def serve_metrics(port=None, host=None):
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port or _server is not None:
+        return _server
+    metrics = get_metrics()
+    with _metrics_lock:
+        if _server is None:
+            try:
+                _server = start_http_server(int(port), metrics, host or os.getenv("METRICS_HOST", "127.0.0.1"))
+            except OSError as e:
+                logger.warning("Could not serve metrics on port %s: %s", port, e)
+    return _server
@@ -0,0 +1,153 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("food processor blender motor capacity blade bowl attachment warranty power speed "
+         "chopping kneading slicing budget design safety cleaning performance review").split()
+
+
+# Knobs for the stand-in endpoint. latency is the delay before the first token,
+# tokens_per_sec paces generation, error_rate is the share of requests answered
+# with 429 and a Retry-After of retry_after seconds.
+class MockConfig:
+    def __init__(self, latency=0.2, tokens_per_sec=400.0, completion_tokens=300, error_rate=0.0, retry_after=0.1, seed=None):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+
+# Markdown-shaped filler so the DOCX renderer sees headings, lists and emphasis.
+def fake_tokens(topic, count):
+    yield f"## {topic}\n\n"
+    for i in range(1, count):
+        if i % 60 == 0:
+            yield f"\n\n### Section {i // 60}\n\n"
+        elif i % 20 == 0:
+            yield f"\n- **{WORDS[i % len(WORDS)]}** "
+        else:
+            yield WORDS[(i * 7) % len(WORDS)] + " "
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with config.lock:
+                config.requests += 1
+                reject = config.random.random() < config.error_rate
+                if reject:
+                    config.rejected += 1
+            if reject:
+                self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                                {"Retry-After": str(config.retry_after)})
+                return
+
+            messages = payload.get("messages", [])
+            topic = messages[-1]["content"].splitlines()[0] if messages else "Topic"
+            count = min(config.completion_tokens, payload.get("max_tokens") or config.completion_tokens)
+            finish_reason = "length" if count < config.completion_tokens else "stop"
+            prompt_tokens = sum(len(message.get("content", "").split()) for message in messages)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count, "total_tokens": prompt_tokens + count}
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            time.sleep(config.latency)
+
+            if payload.get("stream"):
+                self._stream(payload, topic, count, finish_reason, usage, completion_id)
+                return
+            if config.tokens_per_sec:
+                time.sleep(count / config.tokens_per_sec)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(fake_tokens(topic, count))},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+
+        def _stream(self, payload, topic, count, finish_reason, usage, completion_id):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send_event(body):
+                data = f"data: {body}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec else 0
+            for token in fake_tokens(topic, count):
+                send_event(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "model": payload.get("model"),
+                                       "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+                if interval:
+                    time.sleep(interval)
+            send_event(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "model": payload.get("model"),
+                                   "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}))
+            if (payload.get("stream_options") or {}).get("include_usage"):
+                send_event(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "choices": [], "usage": usage}))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# Starts the server on a background thread; port 0 picks a free port.
+# Returns the server and the chat completions URL to point Llama_API_URL at.
+def start_mock_server(config=None, host="127.0.0.1", port=0):
+    config = config or MockConfig()
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the Llama endpoint.")
+    parser.add_argument("--port", type=int, default=8199)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tps", type=float, default=400.0, help="Generated tokens per second (0 = instant)")
+    parser.add_argument("--tokens", type=int, default=300, help="Completion tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds on injected 429s")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.tps, args.tokens, args.error_rate, args.retry_after)
+    server, url = start_mock_server(config, port=args.port)
+    print(f"Mock LLM listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
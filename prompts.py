@@ -0,0 +1,128 @@
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from collections import namedtuple
+
+# Kept byte-identical across every request so provider-side prefix caching can
+# reuse it. Anything that varies per job goes after the structure or into the
+# user message.
+SYSTEM_PREFIX = (
+    "Act as an expert content writer and generate a blog for my e-commerce site BestViewsReviews for Amazon Products. "
+    "It is a GenAI platform that analyzes unstructured e-commerce product information like customer reviews, blogs, "
+    "manufacturer-written product descriptions, etc., and generates insights and product recommendations.\n"
+    "Following is the structure of the blog:\n"
+)
+
+CONTEXT_WINDOWS = {
+    "meta-llama/Meta-Llama-3-8B-Instruct": 8192,
+    "llama3-70b-8192": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_MAX_TOKENS = 2048
+MIN_COMPLETION_TOKENS = 256
+# Product grounding: products retrieved per topic and their share of the prompt
+DEFAULT_TOP_K = 5
+DEFAULT_CONTEXT_TOKENS = 1200
+# Role markers and special tokens the chat template adds per message
+MESSAGE_OVERHEAD = 4
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+Completion = namedtuple("Completion", "text finish_reason usage cached")
+
+
+class PromptTooLong(ValueError):
+    pass
+
+
+# Approximates a Llama 3 style BPE count without shipping the tokenizer: one
+# token per punctuation mark and per five characters of each word. It errs on
+# the high side, which is the safe direction for context budgeting.
+def count_tokens(text):
+    return sum((len(piece) + 4) // 5 for piece in TOKEN_RE.findall(text))
+
+
+def count_message_tokens(messages):
+    return sum(count_tokens(message["content"]) + MESSAGE_OVERHEAD for message in messages)
+
+
+def normalize_structure(structure):
+    return "\n".join(line.strip() for line in structure.strip().splitlines())
+
+
+def build_messages(topic, structure, description=None, section=None):
+    system_prompt = SYSTEM_PREFIX + normalize_structure(structure)
+    user_prompt = f"Topic: {topic}"
+    if description:
+        user_prompt += f"\nproduct description: {description}"
+    if section is not None:
+        user_prompt += (
+            "\nWrite only the following section of this blog, starting with its heading. "
+            f"Do not write any other section.\nSection: {section.title}\n{section.details}"
+        )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+# Caps max_tokens at what is left of the model's context window after the prompt.
+def budget_max_tokens(messages, model, cap=DEFAULT_MAX_TOKENS):
+    window = CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    prompt_tokens = count_message_tokens(messages)
+    available = window - prompt_tokens
+    if available < MIN_COMPLETION_TOKENS:
+        raise PromptTooLong(f"Prompt is ~{prompt_tokens} tokens, leaving {available} of {model}'s {window}-token context")
+    return min(cap, available)
+
+
+def completion_from_response(response_json, estimated_prompt_tokens=None, cached=False):
+    choice = response_json["choices"][0]
+    usage = dict(response_json.get("usage") or {})
+    if estimated_prompt_tokens is not None:
+        usage["estimated_prompt_tokens"] = estimated_prompt_tokens
+    return Completion(choice["message"]["content"], choice.get("finish_reason"), usage, cached)
+
+
+_batch_records = contextvars.ContextVar("bvr_usage_records", default=None)
+
+
+# Per-job token usage, in arrival order. The tracker can be shared by every UI
+# session, so a caller reads its own calls back through batch(), not from
+# records.
+class UsageTracker:
+    def __init__(self, max_records=5000):
+        self.max_records = max_records
+        self.records = []
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def record(self, label, completion):
+        batch = _batch_records.get()
+        with self._lock:
+            self.seq += 1
+            self.records.append({
+                "seq": self.seq,
+                "job": label,
+                "prompt_tokens": completion.usage.get("prompt_tokens"),
+                "completion_tokens": completion.usage.get("completion_tokens"),
+                "estimated_prompt_tokens": completion.usage.get("estimated_prompt_tokens"),
+                "finish_reason": completion.finish_reason,
+                "cached": completion.cached,
+            })
+            if batch is not None:
+                batch.append(self.records[-1])
+            if len(self.records) > self.max_records:
+                del self.records[:len(self.records) - self.max_records]
+
+    # Collects the records made inside it, including those from batch workers,
+    # which copy the caller's contextvars.
+    @contextmanager
+    def batch(self):
+        records = []
+        token = _batch_records.set(records)
+        try:
+            yield records
+        finally:
+            _batch_records.reset(token)
@@ -0,0 +1,262 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+from http_client import get_http_client
+from metrics import get_metrics
+from prompts import DEFAULT_MAX_TOKENS, PromptTooLong, budget_max_tokens, count_message_tokens
+from scheduler import GenerationError
+
+LLAMA_MODEL = "meta-llama/Meta-Llama-3-8B-Instruct"
+GROQ_MODEL = "llama3-70b-8192"
+
+
+# Every provider returns OpenAI-style dicts: complete() gives a chat.completion
+# response and open_stream() an iterator of chat.completion.chunk dicts. That
+# keeps caching, usage accounting and SSE handling provider-agnostic.
+class LlamaHTTPProvider:
+    name = "llama"
+
+    def __init__(self, api_url, api_key, model=LLAMA_MODEL, client=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.client = client or get_http_client()
+        self.key = f"{self.name}:{model}"
+
+    def _body(self, messages, max_tokens, temperature, top_p, **extra):
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}'
+        }
+        payload = {
+            "model": self.model,
+            "temperature": temperature,
+            "top_p": top_p,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            **extra
+        }
+        return headers, json.dumps(payload)
+
+    def complete(self, messages, max_tokens, temperature, top_p):
+        headers, body = self._body(messages, max_tokens, temperature, top_p)
+        response = self.client.post(self.api_url, headers=headers, content=body)
+        response.raise_for_status()
+        return response.json()
+
+    def open_stream(self, messages, max_tokens, temperature, top_p):
+        headers, body = self._body(messages, max_tokens, temperature, top_p,
+                                   stream=True, stream_options={"include_usage": True})
+        request = self.client.build_request("POST", self.api_url, headers=headers, content=body)
+        response = self.client.send(request, stream=True)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError:
+            response.close()
+            raise
+        return self._iter_sse(response)
+
+    # Reads the body to the end even after [DONE]; closing a half-read response
+    # drops the connection instead of returning it to the keep-alive pool.
+    def _iter_sse(self, response):
+        done = False
+        try:
+            for line in response.iter_lines():
+                if done or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    continue
+                yield json.loads(data)
+        finally:
+            response.close()
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, api_key, model=GROQ_MODEL):
+        from groq import Groq
+        # Retries are owned by the scheduler, not the SDK
+        self.client = Groq(api_key=api_key, max_retries=0)
+        self.model = model
+        self.key = f"{self.name}:{model}"
+
+    def complete(self, messages, max_tokens, temperature, top_p):
+        chat_completion = self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        return chat_completion.model_dump()
+
+    def open_stream(self, messages, max_tokens, temperature, top_p):
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            stream=True,
+        )
+        return self._iter_chunks(stream)
+
+    def _iter_chunks(self, stream):
+        for chunk in stream:
+            chunk = chunk.model_dump()
+            # Groq reports usage on the last chunk under x_groq
+            x_groq = chunk.pop("x_groq", None) or {}
+            if x_groq.get("usage"):
+                chunk["usage"] = x_groq["usage"]
+            yield chunk
+
+
+# Rolling latency and error window for one backend.
+class ProviderStats:
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.last_error = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self.outcomes.append(ok)
+            if ok and latency is not None:
+                self.latencies.append(latency)
+            if not ok:
+                self.last_error = time.monotonic()
+
+    def percentile(self, q):
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def samples(self):
+        return len(self.outcomes)
+
+
+# Sends each call to the healthy backend with the lowest rolling p95 latency and
+# falls through to the next one on failure. A backend whose error rate crosses
+# max_error_rate is skipped until cooldown seconds after its last error, then
+# probed again. Backends without latency samples yet are tried first.
+class Router:
+    def __init__(self, providers, scheduler, max_error_rate=0.5, min_samples=5, cooldown=60.0, explore_rate=0.05):
+        self.providers = list(providers)
+        self.scheduler = scheduler
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.explore_rate = explore_rate
+        self.stats = {provider.key: ProviderStats() for provider in self.providers}
+
+    def keys(self):
+        return [provider.key for provider in self.providers]
+
+    def healthy(self, provider):
+        stats = self.stats[provider.key]
+        return stats.samples < self.min_samples or stats.error_rate <= self.max_error_rate \
+            or time.monotonic() - stats.last_error > self.cooldown
+
+    def ranked(self):
+        healthy = [provider for provider in self.providers if self.healthy(provider)]
+        unhealthy = [provider for provider in self.providers if provider not in healthy]
+        healthy.sort(key=lambda provider: self.stats[provider.key].percentile(0.95) or 0.0)
+        # Occasionally re-measure a slower backend so its stats don't go stale
+        if len(healthy) > 1 and random.random() < self.explore_rate:
+            healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+        return healthy + unhealthy
+
+    def _call(self, method, messages, max_tokens, temperature, top_p, record_latency):
+        if not self.providers:
+            raise GenerationError("No LLM backend configured; set Llama_API_URL/Llama_API_KEY or GROQ_API_KEY")
+        last_error = None
+        for provider in self.ranked():
+            try:
+                budget = budget_max_tokens(messages, provider.model, max_tokens)
+            except PromptTooLong as e:
+                last_error = GenerationError(str(e))
+                continue
+            tokens = count_message_tokens(messages) + budget
+            metrics = get_metrics()
+            network = [0.0]
+
+            def send():
+                send_started = time.perf_counter()
+                try:
+                    return getattr(provider, method)(messages, budget, temperature, top_p)
+                finally:
+                    network[0] = time.perf_counter() - send_started
+                    metrics.observe("network" if record_latency else "stream_open", network[0], provider.key)
+
+            started = time.monotonic()
+            try:
+                # Includes rate-limit waits and retries on top of the network time
+                with metrics.timer("llm_call" if record_latency else "llm_stream_open", provider.key):
+                    result = self.scheduler.call(provider.key, send, tokens)
+            except GenerationError as e:
+                self.stats[provider.key].record(None, False)
+                last_error = e
+                continue
+            self.stats[provider.key].record(time.monotonic() - started if record_latency else None, True)
+            if record_latency:
+                usage = result.get("usage") or {}
+                metrics.observe_throughput(provider.key, usage.get("completion_tokens"), network[0])
+            return provider, result
+        raise last_error
+
+    def complete(self, messages, max_tokens=DEFAULT_MAX_TOKENS, temperature=0.7, top_p=0.95):
+        return self._call("complete", messages, max_tokens, temperature, top_p, record_latency=True)
+
+    # Falls back only while opening the stream; time to open is not comparable to
+    # a full completion, so streams update health but not latency.
+    def open_stream(self, messages, max_tokens=DEFAULT_MAX_TOKENS, temperature=0.7, top_p=0.95):
+        return self._call("open_stream", messages, max_tokens, temperature, top_p, record_latency=False)
+
+    def snapshot(self):
+        rows = []
+        for provider in self.providers:
+            stats = self.stats[provider.key]
+            p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+            rows.append({
+                "backend": provider.key,
+                "p50_s": round(p50, 2) if p50 is not None else None,
+                "p95_s": round(p95, 2) if p95 is not None else None,
+                "error_rate": round(stats.error_rate, 2),
+                "samples": stats.samples,
+                "healthy": self.healthy(provider),
+            })
+        return rows
+
+
+# LLM_BACKENDS picks and orders backends (default "llama,groq"); ones without
+# credentials, or whose SDK is not installed, are left out.
+def providers_from_env(client=None):
+    providers = []
+    for name in os.getenv("LLM_BACKENDS", "llama,groq").split(","):
+        name = name.strip()
+        if name == "llama" and os.getenv("Llama_API_URL"):
+            providers.append(LlamaHTTPProvider(os.getenv("Llama_API_URL"), os.getenv("Llama_API_KEY"), client=client))
+        elif name == "groq" and os.getenv("GROQ_API_KEY"):
+            try:
+                providers.append(GroqProvider(os.getenv("GROQ_API_KEY")))
+            except ImportError:
+                continue
+    return providers
@@ -0,0 +1,163 @@
+import re
+from collections import namedtuple
+
+from dedupe import jaccard, normalize_topic
+from scheduler import GenerationError
+from sections import SECTION_MATCH, BlogTree, parse_structure, regenerate_section, title_words
+
+MIN_SECTION_WORDS = 40
+MIN_ANSWER_WORDS = 12
+DEFAULT_RETRY_BUDGET = 3
+QUESTION_MATCH = 0.5
+
+ERROR_TEXT_RE = re.compile(r"^\s*(request failed|error:|an error occurred|sorry, (i|we) (can|could)n[o']?t)", re.IGNORECASE)
+MARKUP_RE = re.compile(r"^[\s#*>\-]*(?:(?:q|question)\s*\d*\s*[:.)]\s*|\d{1,3}[.)]\s*)?|[*_]+$", re.IGNORECASE)
+
+# section is the structure section's title, or None when the whole blog has to
+# be regenerated.
+Issue = namedtuple("Issue", "kind section message")
+# completions are the repair responses, so callers can account for their usage.
+QualityReport = namedtuple("QualityReport", "content issues repairs finish_reason completions")
+
+
+def _clean(line):
+    return MARKUP_RE.sub("", line.strip()).strip()
+
+
+def _is_question(line):
+    return _clean(line).endswith("?")
+
+
+def _body_words(section_text):
+    return len(section_text.split("\n", 1)[1].split()) if "\n" in section_text else 0
+
+
+def _contains(outer, inner):
+    return inner.id.startswith(outer.id + ".")
+
+
+# Maps each structure section to its best-scoring heading in the blog. Pairs are
+# taken best score first (deeper headings on ties), and a heading that contains
+# or sits inside an already mapped one is skipped, as is a title heading that
+# wraps the whole blog.
+def map_sections(tree, specs):
+    sections = [section for section in tree.sections
+                if len(tree.sections) == 1 or not all(_contains(section, other) for other in tree.sections if other is not section)]
+    pairs = []
+    for spec in specs:
+        words = title_words(spec.title)
+        for section in sections:
+            score = jaccard(words, title_words(section.title))
+            if score >= SECTION_MATCH:
+                pairs.append((-score, -section.depth, section.start, spec.title, section))
+    mapped = {}
+    for _, _, _, title, section in sorted(pairs, key=lambda pair: pair[:3]):
+        if title in mapped or any(other is section or _contains(other, section) or _contains(section, other)
+                                  for other in mapped.values()):
+            continue
+        mapped[title] = section
+    return mapped
+
+
+def _question_issues(spec, section_text, min_answer_words):
+    lines = section_text.splitlines()[1:]
+    asked = [i for i, line in enumerate(lines) if _is_question(line)]
+    problems = []
+    for n, i in enumerate(asked):
+        end = asked[n + 1] if n + 1 < len(asked) else len(lines)
+        if len(" ".join(lines[i + 1:end]).split()) < min_answer_words:
+            problems.append(f"Answer '{_clean(lines[i])}' in detail.")
+    asked_words = [set(normalize_topic(_clean(lines[i])).split()) for i in asked]
+    for question in (_clean(line) for line in spec.details.splitlines()):
+        if question.endswith("?"):
+            words = set(normalize_topic(question).split())
+            if not any(jaccard(words, other) >= QUESTION_MATCH for other in asked_words):
+                problems.append(f"Include and answer the question '{question}'.")
+    return problems
+
+
+# Cheap local checks: no LLM calls. Returns a list of Issues, empty when the
+# blog looks complete.
+def check_blog(content, structure, finish_reason=None, min_section_words=MIN_SECTION_WORDS, min_answer_words=MIN_ANSWER_WORDS):
+    if not content or not content.strip() or ERROR_TEXT_RE.match(content):
+        return [Issue("error_text", None, "The output is empty or an error message.")]
+    specs = parse_structure(structure)
+    if len(specs) <= 1:
+        return [Issue("truncated", None, "The output was cut off at max_tokens.")] if finish_reason == "length" else []
+
+    tree = BlogTree(content)
+    mapped = map_sections(tree, specs)
+    missing = [spec for spec in specs if spec.title not in mapped]
+    if len(missing) * 2 > len(specs):
+        return [Issue("missing_structure", None, f"{len(missing)} of {len(specs)} sections are missing.")]
+
+    issues = [Issue("missing_section", spec.title, f"Write the missing section '{spec.title}'.") for spec in missing]
+    if finish_reason == "length":
+        last = max(mapped, key=lambda title: mapped[title].start)
+        issues.append(Issue("truncated", last, "The previous version was cut off; write the complete section."))
+    for spec in specs:
+        section = mapped.get(spec.title)
+        if section is None:
+            continue
+        section_text = tree.section_text(section.id)
+        words = _body_words(section_text)
+        if words < min_section_words:
+            issues.append(Issue("short_section", spec.title, f"Write at least {min_section_words} words (the previous version had {words})."))
+        if "?" in spec.details or "faq" in spec.title.lower():
+            issues.extend(Issue("faq", spec.title, problem) for problem in _question_issues(spec, section_text, min_answer_words))
+    return issues
+
+
+# Re-runs only what failed, within retry_budget extra LLM calls: the whole blog
+# when it is unusable, otherwise each failing section through the section
+# regeneration path, with the failed checks passed along as editor notes.
+# Missing sections are generated and inserted in structure order. Failed retries
+# count against the budget and keep the best version so far.
+def repair_blog(extractor, topic, structure, completion, description=None, retry_budget=DEFAULT_RETRY_BUDGET,
+                min_section_words=MIN_SECTION_WORDS, min_answer_words=MIN_ANSWER_WORDS):
+    content, finish_reason = completion.text, completion.finish_reason
+    repairs = 0
+    completions = []
+    issues = check_blog(content, structure, finish_reason, min_section_words, min_answer_words)
+    while issues and repairs < retry_budget:
+        try:
+            if any(issue.section is None for issue in issues):
+                repairs += 1
+                completion = extractor.complete(topic, structure, refresh=True, description=description)
+                completions.append(completion)
+                content, finish_reason = completion.text, completion.finish_reason
+            else:
+                content, finish_reason, repairs = _repair_sections(
+                    extractor, topic, structure, content, finish_reason, issues, description, retry_budget, repairs, completions)
+        except GenerationError:
+            continue
+        issues = check_blog(content, structure, finish_reason, min_section_words, min_answer_words)
+    return QualityReport(content, issues, repairs, finish_reason, completions)
+
+
+def _repair_sections(extractor, topic, structure, content, finish_reason, issues, description, retry_budget, repairs, completions):
+    specs = parse_structure(structure)
+    order = [spec.title for spec in specs]
+    failing = {}
+    for issue in issues:
+        failing.setdefault(issue.section, []).append(issue)
+    tree = BlogTree(content)
+    for title in sorted(failing, key=order.index):
+        if repairs >= retry_budget:
+            break
+        repairs += 1
+        notes = " ".join(issue.message for issue in failing[title])
+        mapped = map_sections(tree, specs)
+        try:
+            if title in mapped:
+                tree, part = regenerate_section(extractor, topic, structure, tree, mapped[title].id, description, notes)
+            else:
+                part = extractor.complete(topic, structure, refresh=True, description=description, section=specs[order.index(title)])
+                following = next((mapped[later].id for later in order[order.index(title) + 1:] if later in mapped), None)
+                tree = tree.insert(part.text, following)
+        except GenerationError:
+            break
+        completions.append(part)
+        if any(issue.kind == "truncated" for issue in failing[title]):
+            finish_reason = part.finish_reason
+    return tree.text(), finish_reason, repairs
@@ -0,0 +1,185 @@
+import argparse
+import csv
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from dedupe import STOPWORDS, WORD_MARKS, stem
+from prompts import DEFAULT_CONTEXT_TOKENS, DEFAULT_TOP_K, count_tokens
+
+TOKEN_RE = re.compile(rf"[\w{WORD_MARKS}]+")
+TEXT_FIELDS = ("name", "title", "brand", "category", "description", "features", "specifications", "reviews")
+K1 = 1.2
+B = 0.75
+
+DOCS_FILE = "docs.jsonl"
+META_FILE = "meta.json"
+VOCAB_FILE = "vocab.json"
+
+
+def tokenize(text):
+    return [stem(token) for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _flatten(value):
+    if isinstance(value, (list, tuple)):
+        return "; ".join(_flatten(item) for item in value)
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_flatten(item)}" for key, item in value.items())
+    return str(value)
+
+
+# A record's "text" field is used as-is; otherwise the usual catalogue fields are
+# joined, falling back to every field when none of them are present.
+def document_text(record):
+    if record.get("text"):
+        return str(record["text"])
+    fields = [key for key in TEXT_FIELDS if record.get(key)] or [key for key in record if key != "id" and record[key]]
+    return "\n".join(f"{key}: {_flatten(record[key])}" for key in fields)
+
+
+def read_corpus(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# Single pass over the corpus. Documents go to docs.jsonl with their byte
+# offsets; term statistics are written as CSR postings (postings_ptr indexes
+# postings_doc/postings_tf by term id) so the whole index can be memory-mapped.
+def build_index(corpus_path, index_dir):
+    os.makedirs(index_dir, exist_ok=True)
+    vocab = {}
+    postings = []
+    offsets = array("q", [0])
+    doc_lengths = array("f")
+    with open(os.path.join(index_dir, DOCS_FILE), "wb") as docs:
+        for doc_id, record in enumerate(read_corpus(corpus_path)):
+            text = document_text(record)
+            docs.write((json.dumps({"id": record.get("id", doc_id), "text": text}, ensure_ascii=False) + "\n").encode("utf-8"))
+            offsets.append(docs.tell())
+            terms = Counter(tokenize(text))
+            doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append((array("i"), array("f")))
+                postings[term_id][0].append(doc_id)
+                postings[term_id][1].append(tf)
+
+    ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(docs) for docs, _ in postings])
+    np.save(os.path.join(index_dir, "postings_ptr.npy"), ptr)
+    np.save(os.path.join(index_dir, "postings_doc.npy"),
+            np.concatenate([np.frombuffer(docs, dtype=np.int32) for docs, _ in postings]) if postings else np.zeros(0, np.int32))
+    np.save(os.path.join(index_dir, "postings_tf.npy"),
+            np.concatenate([np.frombuffer(tfs, dtype=np.float32) for _, tfs in postings]) if postings else np.zeros(0, np.float32))
+    np.save(os.path.join(index_dir, "doc_lengths.npy"), np.frombuffer(doc_lengths, dtype=np.float32))
+    np.save(os.path.join(index_dir, "doc_offsets.npy"), np.frombuffer(offsets, dtype=np.int64))
+    with open(os.path.join(index_dir, VOCAB_FILE), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    n_docs = len(doc_lengths)
+    with open(os.path.join(index_dir, META_FILE), "w") as f:
+        json.dump({"n_docs": n_docs, "avg_doc_length": sum(doc_lengths) / n_docs if n_docs else 0.0, "k1": K1, "b": B}, f)
+    return n_docs
+
+
+# BM25 over an index written by build_index. The arrays and the documents file
+# are memory-mapped, so loading is instant and only the postings a query touches
+# are paged in; several processes share the same pages.
+class ProductIndex:
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            meta = json.load(f)
+        with open(os.path.join(index_dir, VOCAB_FILE), encoding="utf-8") as f:
+            self.vocab = json.load(f)
+        self.n_docs = meta["n_docs"]
+        self.avg_doc_length = meta["avg_doc_length"] or 1.0
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.ptr = load("postings_ptr.npy")
+        self.postings_doc = load("postings_doc.npy")
+        self.postings_tf = load("postings_tf.npy")
+        self.doc_lengths = load("doc_lengths.npy")
+        self.offsets = load("doc_offsets.npy")
+        self._docs = None
+        if self.n_docs:
+            with open(os.path.join(index_dir, DOCS_FILE), "rb") as f:
+                self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def document(self, doc_index):
+        line = self._docs[int(self.offsets[doc_index]):int(self.offsets[doc_index + 1])]
+        return json.loads(line)
+
+    # Returns [(score, document)] for the k best-scoring documents.
+    def search(self, query, k=DEFAULT_TOP_K):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.ptr[term_id], self.ptr[term_id + 1]
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end]
+            idf = np.log(1 + (self.n_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.document(i)) for i in top]
+
+    # Best matches for the topic that fit in token_budget, formatted for the
+    # prompt's product description. Returns (text, ids).
+    def context(self, topic, k=DEFAULT_TOP_K, token_budget=DEFAULT_CONTEXT_TOKENS):
+        parts = []
+        ids = []
+        used = 0
+        for _, document in self.search(topic, k):
+            tokens = count_tokens(document["text"])
+            if used + tokens > token_budget:
+                continue
+            parts.append(f"- {document['text']}")
+            ids.append(document["id"])
+            used += tokens
+        return "\n".join(parts), ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and query the BM25 product-description index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Index a JSONL or CSV product corpus")
+    build.add_argument("corpus")
+    build.add_argument("--out", default="product_index", help="Index directory")
+    search = subparsers.add_parser("search", help="Show the products selected for a topic")
+    search.add_argument("index")
+    search.add_argument("topic")
+    search.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    search.add_argument("--context-tokens", type=int, default=DEFAULT_CONTEXT_TOKENS)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(f"Indexed {build_index(args.corpus, args.out)} documents into {args.out}", file=sys.stderr)
+        return 0
+    text, ids = ProductIndex(args.index).context(args.topic, args.top_k, args.context_tokens)
+    print(f"Selected {len(ids)} products ({count_tokens(text)} tokens): {ids}", file=sys.stderr)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
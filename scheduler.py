@@ -0,0 +1,162 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+CONNECTION_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+# Raised instead of returning error text as blog content, so callers can tell
+# a failed job apart from a generated one.
+class GenerationError(Exception):
+    def __init__(self, message, status=None, retryable=False, attempts=1):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.retryable = retryable
+        self.attempts = attempts
+
+    def to_dict(self):
+        return {
+            "error": self.message,
+            "status": self.status,
+            "retryable": self.retryable,
+            "attempts": self.attempts,
+        }
+
+
+def parse_retry_after(headers):
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+# Works for both httpx errors and the Groq SDK's APIStatusError/APIConnectionError.
+def classify_error(exc):
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if status is not None:
+        headers = getattr(response, "headers", None)
+        return status, status in RETRYABLE_STATUS, parse_retry_after(headers)
+    retryable = isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)) \
+        or type(exc).__name__ in CONNECTION_ERRORS
+    return None, retryable, None
+
+
+# Sliding one-minute window over request and token budgets for one provider/model.
+# A limit of 0 disables that budget.
+class RateLimiter:
+    def __init__(self, rpm=0, tpm=0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events = deque()
+        self._tokens = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, now, tokens):
+        while self._events and now - self._events[0][0] >= 60:
+            self._tokens -= self._events.popleft()[1]
+        wait = self._paused_until - now
+        if self.rpm and len(self._events) >= self.rpm:
+            wait = max(wait, self._events[0][0] + 60 - now)
+        if self.tpm and self._events and self._tokens + tokens > self.tpm:
+            wait = max(wait, self._events[0][0] + 60 - now)
+        return wait
+
+    def acquire(self, tokens=0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._wait_time(now, tokens)
+                if wait <= 0:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+            time.sleep(min(wait, 5.0))
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class Scheduler:
+    def __init__(self, limits=None, default_rpm=0, default_tpm=0, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.limits = limits or {}
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            default_rpm=int(os.getenv("LLM_RPM", 0)),
+            default_tpm=int(os.getenv("LLM_TPM", 0)),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", 5)),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0)),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", 60.0)),
+        )
+
+    def limiter(self, key):
+        with self._lock:
+            if key not in self._limiters:
+                rpm, tpm = self.limits.get(key, (self.default_rpm, self.default_tpm))
+                self._limiters[key] = RateLimiter(rpm, tpm)
+            return self._limiters[key]
+
+    def backoff(self, attempt):
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # Call fn under the rate budget for key, retrying transient failures.
+    # Anything that still fails is raised as GenerationError.
+    def call(self, key, fn, tokens=0):
+        limiter = self.limiter(key)
+        attempt = 0
+        while True:
+            limiter.acquire(tokens)
+            try:
+                return fn()
+            except GenerationError:
+                raise
+            except Exception as exc:
+                status, retryable, retry_after = classify_error(exc)
+                attempt += 1
+                if not retryable or attempt > self.max_retries:
+                    raise GenerationError(str(exc) or type(exc).__name__, status, retryable, attempt) from exc
+                if retry_after is not None:
+                    # The next acquire() blocks every caller on this key until then
+                    limiter.pause(retry_after)
+                else:
+                    time.sleep(self.backoff(attempt))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# Rate budgets only work if every caller in the process shares them.
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler.from_env()
+        return _scheduler
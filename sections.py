@@ -0,0 +1,208 @@
+import re
+from collections import namedtuple
+
+from batch import DEFAULT_MAX_IN_FLIGHT, run_batch
+from dedupe import jaccard, normalize_topic
+from prompts import Completion
+
+Section = namedtuple("Section", "title details")
+
+HEADER_RE = re.compile(r"^(blog\s+)?structure\s*:?$", re.IGNORECASE)
+NUMBERED_RE = re.compile(r"^\d+[.)]\s*")
+BULLET_RE = re.compile(r"^[-*•]\s+")
+TITLE_END_RE = re.compile(r"\s[–—-]\s|:|\(")
+# Minimum word Jaccard for a blog heading to count as a structure entry
+SECTION_MATCH = 0.3
+
+
+def _title(line):
+    title = NUMBERED_RE.sub("", line).replace("**", "").strip()
+    return TITLE_END_RE.split(title, 1)[0].strip() or title
+
+
+# Splits a free-text blog structure into top-level sections. Bullets and
+# questions attach to the section above them; when the structure is numbered,
+# only numbered lines start a new section.
+def parse_structure(structure):
+    lines = [line.strip() for line in structure.splitlines()]
+    numbered = any(NUMBERED_RE.match(line) for line in lines)
+    sections = []
+    for line in lines:
+        if not line or (not sections and HEADER_RE.match(line)):
+            continue
+        is_detail = BULLET_RE.match(line) or line.endswith("?") or (numbered and not NUMBERED_RE.match(line))
+        if is_detail and sections:
+            sections[-1].details.append(line)
+        else:
+            sections.append(Section(_title(line), [line]))
+    return [Section(section.title, "\n".join(section.details)) for section in sections]
+
+
+def merge_usage(parts):
+    usage = {}
+    for part in parts:
+        for key, value in part.usage.items():
+            if isinstance(value, (int, float)):
+                usage[key] = usage.get(key, 0) + value
+    return usage
+
+
+def merge_completions(parts):
+    usage = merge_usage(parts)
+    finish_reason = "length" if any(part.finish_reason == "length" for part in parts) else parts[-1].finish_reason
+    return Completion(
+        "\n\n".join(part.text.strip() for part in parts),
+        finish_reason,
+        usage,
+        all(part.cached for part in parts),
+    )
+
+
+# Generates each section in its own request, all sharing the same system prompt
+# prefix, and stitches them back in structure order. Each section gets the full
+# max_tokens budget, so long structures are no longer cut off. Inside a batch
+# the sections take their requests from the batch's slots (batch.request_slot).
+def generate_sectioned(extractor, topic, structure, refresh=False, description=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    sections = parse_structure(structure)
+    if len(sections) <= 1:
+        return extractor.complete(topic, structure, refresh=refresh, description=description)
+
+    def generate(section):
+        return extractor.complete(topic, structure, refresh=refresh, description=description, section=section)
+
+    return merge_completions(run_batch(generate, [(section,) for section in sections], max_in_flight))
+
+
+BlogSection = namedtuple("BlogSection", "id depth title start end chunks")
+
+HEADING_LINE_RE = re.compile(r"^[ \t]*(#{1,6})[ \t]+(.+?)[ \t#]*$")
+BOLD_HEADING_RE = re.compile(r"^[ \t]*\*\*([^*]+)\*\*[ \t]*:?[ \t]*$")
+
+
+def _heading_match(line):
+    return HEADING_LINE_RE.match(line) or BOLD_HEADING_RE.match(line)
+
+
+# A generated blog addressed by heading. Markdown headings define the tree; a
+# blog without any uses whole-line **bold** headings instead. Section ids are
+# dotted paths ("3", "3.2") and each section spans its heading up to the next
+# heading of the same or a higher level. Chunks are the runs of lines between
+# consecutive headings (chunk 0 is anything before the first heading), the unit
+# BlogDocument renders and patches.
+class BlogTree:
+    def __init__(self, text):
+        self.lines = text.strip("\n").splitlines()
+        markdown = any(HEADING_LINE_RE.match(line) for line in self.lines)
+        self.headings = []
+        for line_no, line in enumerate(self.lines):
+            match = (HEADING_LINE_RE if markdown else BOLD_HEADING_RE).match(line)
+            if match:
+                level, title = (len(match.group(1)), match.group(2)) if markdown else (2, match.group(1))
+                self.headings.append((line_no, level, title.strip()))
+
+        self.sections = []
+        stack = []
+        child_counts = {}
+        for k, (line_no, level, title) in enumerate(self.headings):
+            last = next((j for j in range(k + 1, len(self.headings)) if self.headings[j][1] <= level), len(self.headings))
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            parent_id = stack[-1][1] if stack else ""
+            child_counts[parent_id] = child_counts.get(parent_id, 0) + 1
+            section_id = f"{parent_id}.{child_counts[parent_id]}" if parent_id else str(child_counts[parent_id])
+            end = self.headings[last][0] if last < len(self.headings) else len(self.lines)
+            self.sections.append(BlogSection(section_id, len(stack), title, line_no, end, (k, last)))
+            stack.append((level, section_id))
+
+    def text(self):
+        return "\n".join(self.lines)
+
+    def find(self, section_id):
+        for section in self.sections:
+            if section.id == section_id:
+                return section
+        raise KeyError(section_id)
+
+    def section_text(self, section_id):
+        section = self.find(section_id)
+        return "\n".join(self.lines[section.start:section.end]).strip("\n")
+
+    def parent(self, section_id):
+        parent_id = section_id.rpartition(".")[0]
+        return self.find(parent_id) if parent_id else None
+
+    def chunk_texts(self):
+        starts = [line_no for line_no, _, _ in self.headings]
+        bounds = [0] + starts + [len(self.lines)]
+        return ["\n".join(self.lines[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+    # Returns a new tree with the section's lines swapped for text. The original
+    # heading line is kept, and anything the model wrote before its own heading
+    # is dropped, so the section keeps its place and id.
+    def replace(self, section_id, text):
+        section = self.find(section_id)
+        new_lines = text.strip("\n").splitlines()
+        first = next((i for i, line in enumerate(new_lines) if _heading_match(line)), None)
+        if first is None:
+            new_lines = [self.lines[section.start], ""] + new_lines
+        else:
+            new_lines = [self.lines[section.start]] + new_lines[first + 1:]
+        if section.end < len(self.lines):
+            new_lines.append("")
+        return BlogTree("\n".join(self.lines[:section.start] + new_lines + self.lines[section.end:]))
+
+    # Returns a new tree with text added as a section of its own, just before
+    # the section with id before, or at the end. Anything ahead of the text's
+    # first heading is dropped.
+    def insert(self, text, before=None):
+        at = self.find(before).start if before is not None else len(self.lines)
+        new_lines = text.strip("\n").splitlines()
+        first = next((i for i, line in enumerate(new_lines) if _heading_match(line)), 0)
+        new_lines = new_lines[first:]
+        if at > 0 and self.lines[at - 1].strip():
+            new_lines.insert(0, "")
+        if at < len(self.lines):
+            new_lines.append("")
+        return BlogTree("\n".join(self.lines[:at] + new_lines + self.lines[at:]))
+
+
+def title_words(text):
+    return set(normalize_topic(text).split())
+
+
+# The structure entry whose title shares the most words with the heading.
+def match_structure_section(structure, title):
+    return best_section(parse_structure(structure), title)
+
+
+def best_section(sections, title):
+    words = title_words(title)
+    best = None
+    best_score = 0.0
+    for section in sections:
+        score = jaccard(words, title_words(section.title))
+        if score > best_score:
+            best, best_score = section, score
+    return best if best_score >= SECTION_MATCH else None
+
+
+# Regenerates one section of an existing blog. The system prompt keeps the full
+# structure, so the shared prefix is reused; the user message asks for just
+# that section (plus optional editor notes).
+# Bypasses the cache by default since the point is a different answer.
+# Returns the updated tree and the Completion for the section.
+def regenerate_section(extractor, topic, structure, tree, section_id, description=None, instructions=None, refresh=True):
+    section = tree.find(section_id)
+    spec = match_structure_section(structure, section.title)
+    parent = tree.parent(section_id)
+    if spec is not None:
+        details = spec.details
+    elif parent is not None:
+        details = f"{section.title} (part of the section '{parent.title}')"
+    else:
+        details = section.title
+    if instructions:
+        details += f"\nEditor notes: {instructions}"
+    completion = extractor.complete(topic, structure, refresh=refresh, description=description,
+                                    section=Section(section.title, details))
+    return tree.replace(section_id, completion.text), completion